@@ -0,0 +1,380 @@
+"""Load-generation benchmark for the chess backend.
+
+Spins up N simulated games against a running instance of ``main.py``.
+Two scripted players per game make moves through ``POST /games/{id}/moves``
+while spectators listen on ``/ws/{game_id}``. The run reports move
+throughput and move-to-broadcast latency percentiles and writes the results
+as JSON so runs can be compared between versions.
+
+Usage:
+    uvicorn main:app --port 8000
+    python benchmark.py --games 20 --moves 40 --spectators 2 --output bench.json
+    python benchmark.py --games 20 --moves 40 --baseline bench.json
+
+The server's admission control limits moves and WebSocket connections per
+IP, so start it with RATE_LIMIT_ENABLED=false to measure raw capacity.
+Otherwise rate limited requests (429) and spectator connections closed
+with 1013 are counted and retried.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import chess
+import websockets
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("benchmark")
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile, None for an empty sample"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class HttpClient:
+    """Minimal blocking JSON client run on a thread pool"""
+
+    def __init__(self, base_url: str, workers: int, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def _request(self, method: str, path: str, payload: Optional[dict]) -> Tuple[int, dict]:
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(
+            f"{self.base_url}{path}",
+            data=data,
+            method=method,
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+                return response.status, json.loads(body) if body else {}
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            try:
+                return e.code, json.loads(body) if body else {}
+            except ValueError:
+                return e.code, {"detail": body.decode(errors="replace")}
+
+    async def request(self, method: str, path: str, payload: Optional[dict] = None) -> Tuple[int, dict]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._request, method, path, payload)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class BenchmarkStats:
+    def __init__(self):
+        self.moves_sent = 0
+        self.moves_accepted = 0
+        self.moves_rate_limited = 0
+        self.rate_limited = 0  # create/join requests answered 429
+        self.spectators_rate_limited = 0  # spectator connections closed with 1013
+        self.move_errors: Dict[str, int] = {}
+        self.request_latencies: List[float] = []
+        self.broadcast_latencies: List[float] = []
+        self.games_started = 0
+        self.games_failed = 0
+        self.games_finished = 0
+        self.spectators_connected = 0
+        self.spectator_errors = 0
+        # (game_id, move_number) -> perf_counter() when the POST was sent
+        self.move_sent_at: Dict[Tuple[str, int], float] = {}
+
+    def record_error(self, reason: str):
+        self.move_errors[reason] = self.move_errors.get(reason, 0) + 1
+
+
+def backoff(attempt: int) -> float:
+    """Seconds before retry number attempt + 1; token buckets refill slowly under a burst"""
+    return min(2.0 ** attempt, 8.0)
+
+
+async def request_with_retry(client: HttpClient, method: str, path: str, payload: Optional[dict],
+                             args, stats: BenchmarkStats) -> Tuple[int, dict]:
+    """Send a request, retrying while the server answers 429"""
+    for attempt in range(args.retries + 1):
+        status_code, body = await client.request(method, path, payload)
+        if status_code != 429 or attempt == args.retries:
+            return status_code, body
+        stats.rate_limited += 1
+        await asyncio.sleep(backoff(attempt))
+
+
+async def connect_spectator(url: str, args, stats: BenchmarkStats):
+    """Open a spectator socket and read the initial state, retrying 1013 (try again later) closes"""
+    for attempt in range(args.retries + 1):
+        ws = await websockets.connect(url, open_timeout=30)
+        try:
+            # The server sends the initial game state once the socket is registered
+            await ws.recv()
+            return ws
+        except websockets.ConnectionClosed as e:
+            await ws.close()
+            if e.rcvd is None or e.rcvd.code != 1013 or attempt == args.retries:
+                raise
+            stats.spectators_rate_limited += 1
+            await asyncio.sleep(backoff(attempt))
+
+
+async def spectate(ws_url: str, game_id: str, name: str, args, stats: BenchmarkStats,
+                   ready: asyncio.Event, done: asyncio.Event):
+    url = f"{ws_url}/ws/{game_id}?player_name={name}"
+    try:
+        ws = await connect_spectator(url, args, stats)
+        try:
+            stats.spectators_connected += 1
+            ready.set()
+            while not done.is_set():
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    continue
+                received_at = time.perf_counter()
+                message = json.loads(raw)
+                if message.get("type") != "move_made":
+                    continue
+                key = (game_id, message["move"]["move_number"])
+                sent_at = stats.move_sent_at.get(key)
+                if sent_at is not None:
+                    stats.broadcast_latencies.append(received_at - sent_at)
+        finally:
+            await ws.close()
+    except Exception as e:
+        stats.spectator_errors += 1
+        logger.error(f"Spectator {name} on game {game_id} failed: {e}")
+        ready.set()
+
+
+async def play_game(index: int, client: HttpClient, args, stats: BenchmarkStats):
+    run_tag = args.run_tag
+    white_name = f"bench_{run_tag}_{index}_w"
+    black_name = f"bench_{run_tag}_{index}_b"
+
+    status_code, game = await request_with_retry(client, "POST", "/games/", {
+        "player_name": white_name,
+        "time_control": args.time_control,
+        "increment": 0,
+    }, args, stats)
+    if status_code != 200:
+        stats.games_failed += 1
+        logger.error(f"Game {index}: create failed ({status_code}): {game.get('detail')}")
+        return
+    game_id = game["id"]
+    white_id = game["white_player_id"]
+
+    status_code, joined = await request_with_retry(
+        client, "POST", f"/games/{game_id}/join", {"player_name": black_name}, args, stats)
+    if status_code != 200:
+        stats.games_failed += 1
+        logger.error(f"Game {index}: join failed ({status_code}): {joined.get('detail')}")
+        return
+    black_id = joined["player_id"]
+    stats.games_started += 1
+
+    done = asyncio.Event()
+    spectators = []
+    for s in range(args.spectators):
+        ready = asyncio.Event()
+        name = f"bench_{run_tag}_{index}_s{s}"
+        spectators.append((ready, asyncio.create_task(
+            spectate(args.ws_url, game_id, name, args, stats, ready, done))))
+    for ready, _ in spectators:
+        await ready.wait()
+
+    # Moves are picked locally with a seeded RNG so every run plays the same games
+    rng = random.Random(args.seed + index)
+    board = chess.Board()
+    for move_number in range(1, args.moves + 1):
+        if board.is_game_over():
+            break
+        move = rng.choice(sorted(board.legal_moves, key=lambda m: m.uci()))
+        player_id = white_id if board.turn == chess.WHITE else black_id
+
+        stats.moves_sent += 1
+        for attempt in range(args.retries + 1):
+            sent_at = time.perf_counter()
+            stats.move_sent_at[(game_id, move_number)] = sent_at
+            status_code, body = await client.request("POST", f"/games/{game_id}/moves", {
+                "move": move.uci(),
+                "player_id": player_id,
+            })
+            if status_code != 429 or attempt == args.retries:
+                break
+            stats.moves_rate_limited += 1
+            await asyncio.sleep(1.0)
+        stats.request_latencies.append(time.perf_counter() - sent_at)
+
+        if status_code != 200:
+            stats.record_error(f"{status_code}: {body.get('detail')}")
+            break
+        stats.moves_accepted += 1
+        board.push(move)
+
+        if args.think_time > 0:
+            await asyncio.sleep(args.think_time)
+
+    if board.is_game_over():
+        stats.games_finished += 1
+
+    # Give in-flight broadcasts a moment to land before spectators hang up
+    await asyncio.sleep(args.drain)
+    done.set()
+    await asyncio.gather(*(task for _, task in spectators), return_exceptions=True)
+
+
+def summarize(stats: BenchmarkStats, args, elapsed: float, server_info: dict) -> dict:
+    def latency_summary(values: List[float]) -> dict:
+        ms = [v * 1000 for v in values]
+        return {
+            "count": len(ms),
+            "mean_ms": statistics.fmean(ms) if ms else None,
+            "p50_ms": percentile(ms, 50),
+            "p99_ms": percentile(ms, 99),
+            "max_ms": max(ms) if ms else None,
+        }
+
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "server": {
+            "base_url": args.base_url,
+            "version": server_info.get("version"),
+        },
+        "config": {
+            "games": args.games,
+            "moves": args.moves,
+            "spectators": args.spectators,
+            "time_control": args.time_control,
+            "think_time": args.think_time,
+            "seed": args.seed,
+        },
+        "elapsed_seconds": elapsed,
+        "throughput_moves_per_second": stats.moves_accepted / elapsed if elapsed > 0 else 0.0,
+        "games": {
+            "started": stats.games_started,
+            "failed": stats.games_failed,
+            "finished": stats.games_finished,
+            "rate_limited": stats.rate_limited,
+        },
+        "moves": {
+            "sent": stats.moves_sent,
+            "accepted": stats.moves_accepted,
+            "rate_limited": stats.moves_rate_limited,
+            "errors": stats.move_errors,
+        },
+        "spectators": {
+            "connected": stats.spectators_connected,
+            "errors": stats.spectator_errors,
+            "rate_limited": stats.spectators_rate_limited,
+        },
+        "move_request_latency": latency_summary(stats.request_latencies),
+        "move_to_broadcast_latency": latency_summary(stats.broadcast_latencies),
+    }
+
+
+def compare(results: dict, baseline: dict) -> List[str]:
+    """Human readable deltas against a previous results file"""
+    lines = []
+    checks = [
+        ("throughput (moves/s)", ["throughput_moves_per_second"], True),
+        ("request p50 (ms)", ["move_request_latency", "p50_ms"], False),
+        ("request p99 (ms)", ["move_request_latency", "p99_ms"], False),
+        ("broadcast p50 (ms)", ["move_to_broadcast_latency", "p50_ms"], False),
+        ("broadcast p99 (ms)", ["move_to_broadcast_latency", "p99_ms"], False),
+    ]
+    for label, path, higher_is_better in checks:
+        current, previous = results, baseline
+        for key in path:
+            current = current.get(key) if isinstance(current, dict) else None
+            previous = previous.get(key) if isinstance(previous, dict) else None
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous * 100
+        regressed = change < 0 if higher_is_better else change > 0
+        marker = "REGRESSION" if regressed and abs(change) >= 10 else ""
+        lines.append(f"{label:<22} {previous:>10.2f} -> {current:>10.2f} ({change:+.1f}%) {marker}".rstrip())
+    return lines
+
+
+async def run(args) -> dict:
+    client = HttpClient(args.base_url, workers=max(8, args.games * 2), timeout=args.timeout)
+    stats = BenchmarkStats()
+    try:
+        try:
+            status_code, server_info = await client.request("GET", "/")
+        except urllib.error.URLError as e:
+            raise SystemExit(f"Server at {args.base_url} is not reachable: {e.reason}")
+        if status_code != 200:
+            raise SystemExit(f"Server at {args.base_url} is not reachable ({status_code})")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(play_game(i, client, args, stats) for i in range(args.games)))
+        elapsed = time.perf_counter() - start
+    finally:
+        client.close()
+    return summarize(stats, args, elapsed, server_info)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Concurrent game load benchmark")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--ws-url", default=None, help="Defaults to base-url with ws:// scheme")
+    parser.add_argument("--games", type=int, default=10, help="Concurrent games")
+    parser.add_argument("--moves", type=int, default=40, help="Max plies per game")
+    parser.add_argument("--spectators", type=int, default=1, help="WebSocket spectators per game")
+    parser.add_argument("--time-control", type=int, default=3600)
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds between moves")
+    parser.add_argument("--drain", type=float, default=0.5, help="Seconds to wait for last broadcasts")
+    parser.add_argument("--timeout", type=float, default=30.0, help="HTTP timeout in seconds")
+    parser.add_argument("--retries", type=int, default=5,
+                        help="Retries for a rate limited request (429) or spectator connection (1013)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="Write results JSON to this path")
+    parser.add_argument("--baseline", default=None, help="Compare against a previous results JSON")
+    args = parser.parse_args()
+    if args.ws_url is None:
+        args.ws_url = args.base_url.replace("https://", "wss://").replace("http://", "ws://")
+    args.ws_url = args.ws_url.rstrip("/")
+    # Unique per run so repeated runs don't collide on usernames
+    args.run_tag = uuid.uuid4().hex[:8]
+    return args
+
+
+def main():
+    args = parse_args()
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for line in compare(results, baseline):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, status
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Index, text
+from fastapi.responses import JSONResponse
+from starlette.websockets import WebSocketState
+from sqlalchemy import create_engine, func, insert, update, Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
@@ -13,8 +15,19 @@ from typing import Dict, List, Optional, Union
 import uuid
 from pydantic import BaseModel, Field, validator
 import asyncio
+import fcntl
+import heapq
 import logging
+import mmap
 import os
+import hashlib
+import random
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
 from sqlalchemy.exc import IntegrityError
 
 # Configure logging
@@ -159,6 +172,12 @@ class MoveResponse(BaseModel):
 class JoinGameRequest(BaseModel):
     player_name: str = Field(..., min_length=1, max_length=50)
 
+class TournamentCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    time_control: int = Field(default=180, ge=30, le=3600)
+    increment: int = Field(default=0, ge=0, le=30)
+    duration_minutes: int = Field(default=60, ge=1, le=24 * 60)
+
 # Configuration
 class Settings:
     def __init__(self):
@@ -172,6 +191,64 @@ class Settings:
         self.db_pool_size = 5
         self.db_max_overflow = 10
         self.db_pool_recycle = 3600
+        self.db_pool_timeout = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+        self.db_pool_warmup = int(os.getenv("DB_POOL_WARMUP", str(self.db_pool_size)))
+        
+        # Startup behaviour
+        self.db_connect_timeout = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+        # After a failed connect, requests fail fast for this many seconds while warm-up retries
+        self.db_retry_backoff = float(os.getenv("DB_RETRY_BACKOFF", "10"))
+        # Falling back to SQLite only makes sense for local runs on the built-in default URL
+        self.allow_sqlite_fallback = os.getenv(
+            "ALLOW_SQLITE_FALLBACK", "false" if "DATABASE_URL" in os.environ else "true"
+        ).lower() == "true"
+        
+        # Snapshots of in-flight games for fast recovery after a restart. Each worker writes
+        # GAME_SNAPSHOT_PATH with its slot inserted (game_snapshots.<slot>.json): WORKER_ID if
+        # set, otherwise the lowest slot no running worker holds
+        self.worker_id = os.getenv("WORKER_ID")
+        self.snapshot_path = os.getenv("GAME_SNAPSHOT_PATH", "./game_snapshots.json")
+        self.snapshot_interval = float(os.getenv("GAME_SNAPSHOT_INTERVAL", "5"))
+        # Older snapshots are neither loaded nor kept around
+        self.snapshot_max_age = float(os.getenv("GAME_SNAPSHOT_MAX_AGE", "600"))
+        
+        # Archival of finished games (archive_interval of 0 disables the background job). Archived
+        # rows are deleted from the shared database, so archival only runs once ARCHIVE_DIR is set
+        # explicitly to storage every worker can read
+        self.archive_configured = "ARCHIVE_DIR" in os.environ
+        self.archive_dir = os.getenv("ARCHIVE_DIR", "./archive")
+        self.archive_after_days = int(os.getenv("ARCHIVE_AFTER_DAYS", "7"))
+        self.archive_interval = float(os.getenv(
+            "ARCHIVE_INTERVAL", "3600" if self.archive_configured else "0"
+        ))
+        self.archive_batch_size = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+        
+        # Response cache for game reads
+        self.game_cache_ttl = float(os.getenv("GAME_CACHE_TTL", "5"))
+        self.game_cache_max_entries = int(os.getenv("GAME_CACHE_MAX_ENTRIES", "10000"))
+        
+        # Admission control: token bucket rates are per second, bursts are bucket sizes
+        self.rate_limit_enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+        self.move_rate_per_player = float(os.getenv("MOVE_RATE_PER_PLAYER", "5"))
+        self.move_burst_per_player = float(os.getenv("MOVE_BURST_PER_PLAYER", "10"))
+        self.move_rate_per_ip = float(os.getenv("MOVE_RATE_PER_IP", "20"))
+        self.move_burst_per_ip = float(os.getenv("MOVE_BURST_PER_IP", "40"))
+        self.ws_connect_rate_per_ip = float(os.getenv("WS_CONNECT_RATE_PER_IP", "2"))
+        self.ws_connect_burst_per_ip = float(os.getenv("WS_CONNECT_BURST_PER_IP", "10"))
+        self.ws_message_rate = float(os.getenv("WS_MESSAGE_RATE", "5"))
+        self.ws_message_burst = float(os.getenv("WS_MESSAGE_BURST", "10"))
+        # Requests that check out a pooled connection (get_db) are capped at what the pool holds;
+        # cache hits, leaderboards, tournaments and probes don't count
+        self.max_inflight_requests = int(os.getenv(
+            "MAX_INFLIGHT_REQUESTS", str(self.db_pool_size + self.db_max_overflow)
+        ))
+        self.max_websocket_connections = int(os.getenv("MAX_WEBSOCKET_CONNECTIONS", "2000"))
+        
+        # Leaderboard: seconds between bulk rebuilds that pick up games finished on other workers (0 disables)
+        self.leaderboard_rebuild_interval = float(os.getenv("LEADERBOARD_REBUILD_INTERVAL", "300"))
+        
+        # Arena tournaments: seconds between pairing waves
+        self.tournament_pairing_interval = float(os.getenv("TOURNAMENT_PAIRING_INTERVAL", "2"))
         
         # CORS settings
         self.cors_origins = [
@@ -186,46 +263,265 @@ class Settings:
 settings = Settings()
 
 # Database Configuration
-try:
-    engine = create_engine(
-        settings.database_url,
+# The engine is created lazily (on first use or by the startup warm-up task)
+# so importing this module never blocks on a slow or unreachable database.
+engine = None
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+_engine_lock = threading.Lock()
+db_state = {
+    "ready": False,
+    "dialect": None,
+    "error": None,
+    "fallback": False,
+    "failed_at": None,
+    "warmed_connections": 0
+}
+
+class DatabaseUnavailable(Exception):
+    """The last connect attempt failed and the backoff window hasn't passed"""
+
+def _build_engine(database_url: str):
+    if database_url.startswith("sqlite"):
+        return create_engine(
+            database_url,
+            connect_args={"check_same_thread": False}
+        )
+    return create_engine(
+        database_url,
         pool_pre_ping=True,
         pool_size=settings.db_pool_size,
         max_overflow=settings.db_max_overflow,
         pool_recycle=settings.db_pool_recycle,
+        pool_timeout=settings.db_pool_timeout,
         connect_args={
+            "connect_timeout": settings.db_connect_timeout,
             "keepalives": 1,
             "keepalives_idle": 30,
             "keepalives_interval": 10,
             "keepalives_count": 5
         }
     )
-    # Test the connection
-    with engine.connect() as conn:
-        logger.info("✅ Successfully connected to the database")
-except Exception as e:
-    logger.error(f"❌ Failed to connect to database: {e}")
-    logger.info("⚠️ Falling back to SQLite for local development")
-    # Fallback to SQLite - but note: this won't work well with UUID types
-    settings.database_url = "sqlite:///./local.db"
-    engine = create_engine(
-        settings.database_url,
-        connect_args={"check_same_thread": False}
-    )
 
-# Always rebind SessionLocal after engine is set
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _check_backoff():
+    failed_at = db_state["failed_at"]
+    if failed_at is not None and time.monotonic() - failed_at < settings.db_retry_backoff:
+        raise DatabaseUnavailable(db_state["error"])
+
+def get_engine(retry: bool = False):
+    """Create the engine on first use and bind SessionLocal to it.
+
+    Request paths fail fast with DatabaseUnavailable after a failed connect;
+    only retry=True callers (warm-up and readiness) try again within the backoff.
+    """
+    global engine
+    if engine is not None:
+        return engine
+    if not retry:
+        _check_backoff()
+    with _engine_lock:
+        if engine is not None:
+            return engine
+        if not retry:
+            # Requests queued behind a failed attempt must not each wait out a connect timeout
+            _check_backoff()
+        candidate = _build_engine(settings.database_url)
+        try:
+            # Test the connection, bounded by db_connect_timeout
+            with candidate.connect():
+                logger.info("✅ Successfully connected to the database")
+        except Exception as e:
+            candidate.dispose()
+            db_state["error"] = str(e)
+            db_state["failed_at"] = time.monotonic()
+            logger.error(f"❌ Failed to connect to database: {e}")
+            if not settings.allow_sqlite_fallback:
+                raise
+            logger.warning("⚠️ Falling back to SQLite for local development")
+            # Fallback to SQLite - but note: this won't work well with UUID types
+            settings.database_url = "sqlite:///./local.db"
+            candidate = _build_engine(settings.database_url)
+            db_state["fallback"] = True
+        SessionLocal.configure(bind=candidate)
+        engine = candidate
+        db_state["failed_at"] = None
+        db_state["ready"] = True
+        db_state["dialect"] = candidate.dialect.name
+        return engine
+
+def warm_up_database():
+    """Connect and pre-open pooled connections so the first requests don't pay for it"""
+    try:
+        db_engine = get_engine(retry=True)
+    except Exception as e:
+        logger.error(f"Database warm-up failed: {e}")
+        return
+    if db_engine.dialect.name == "sqlite":
+        return
+    connections = []
+    try:
+        for _ in range(settings.db_pool_warmup):
+            connections.append(db_engine.connect())
+    except Exception as e:
+        logger.warning(f"Pool warm-up stopped after {len(connections)} connections: {e}")
+    finally:
+        db_state["warmed_connections"] = len(connections)
+        for connection in connections:
+            connection.close()
+    logger.info(f"Warmed up {db_state['warmed_connections']} database connections")
 
 # DON'T create tables here - they already exist in your database
 # Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # In-flight games come back from the local snapshot without touching the database
+    game_states.claim_slot(settings.worker_id)
+    restored = game_states.load()
+    if restored:
+        logger.info(f"Restored {restored} in-flight games from {game_states.path}")
+    game_states.remove_stale()
+
+    async def warm_up():
+        await asyncio.to_thread(load_game_archive)
+        await asyncio.to_thread(warm_up_database)
+        # Requests fail fast while the database is down, so reconnecting is left to this task
+        while not db_state["ready"]:
+            await asyncio.sleep(settings.db_retry_backoff)
+            await asyncio.to_thread(warm_up_database)
+        if db_state["ready"]:
+            await asyncio.to_thread(reconcile_game_states)
+            await asyncio.to_thread(rebuild_leaderboard)
+
+    # Warm-up runs in the background so worker boot time doesn't depend on the database
+    warmup_task = asyncio.create_task(warm_up())
+    snapshot_task = asyncio.create_task(snapshot_loop())
+    pairing_task = asyncio.create_task(tournaments.pairing_loop())
+    archive_task = asyncio.create_task(archive_loop()) if settings.archive_interval > 0 else None
+    leaderboard_task = (
+        asyncio.create_task(leaderboard_loop()) if settings.leaderboard_rebuild_interval > 0 else None
+    )
+    yield
+    snapshot_task.cancel()
+    pairing_task.cancel()
+    if archive_task:
+        archive_task.cancel()
+    if leaderboard_task:
+        leaderboard_task.cancel()
+    if not warmup_task.done():
+        await asyncio.wait([warmup_task], timeout=settings.db_connect_timeout)
+        warmup_task.cancel()
+    await snapshot_game_states()
+    if engine is not None:
+        engine.dispose()
+
 # FastAPI App
 app = FastAPI(
     title="Chess Game API",
     version="2.0.0",
-    description="A comprehensive chess game backend with real-time multiplayer support"
+    description="A comprehensive chess game backend with real-time multiplayer support",
+    lifespan=lifespan
 )
 
+# Admission Control
+class TokenBucketLimiter:
+    """Per-key token buckets: each key refills at `rate` tokens/second up to `burst`"""
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, list]" = OrderedDict()  # key -> [tokens, last_refill]
+
+    def allow(self, key: str) -> bool:
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = [self.burst, now]
+            self.buckets[key] = bucket
+            # Drop the least recently seen keys, they would be full again anyway
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self.buckets.move_to_end(key)
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def forget(self, key: str):
+        self.buckets.pop(key, None)
+
+class AdmissionController:
+    """Rate limits and concurrency caps checked before any database work"""
+    def __init__(self, settings: "Settings"):
+        self.settings = settings
+        self.enabled = settings.rate_limit_enabled
+        self.move_player_limiter = TokenBucketLimiter(settings.move_rate_per_player, settings.move_burst_per_player)
+        self.move_ip_limiter = TokenBucketLimiter(settings.move_rate_per_ip, settings.move_burst_per_ip)
+        self.ws_connect_limiter = TokenBucketLimiter(settings.ws_connect_rate_per_ip, settings.ws_connect_burst_per_ip)
+        self.ws_message_limiter = TokenBucketLimiter(settings.ws_message_rate, settings.ws_message_burst)
+        self.inflight_requests = 0  # requests holding a database session
+        self.websocket_connections = 0
+        self.rejections: Dict[str, int] = {}
+        # get_db runs on the threadpool
+        self._inflight_lock = threading.Lock()
+
+    def reject(self, reason: str) -> str:
+        self.rejections[reason] = self.rejections.get(reason, 0) + 1
+        return reason
+
+    def enter_request(self) -> Optional[str]:
+        """Take a database slot, or return the rejection reason when the pool is spoken for"""
+        with self._inflight_lock:
+            if self.enabled and self.inflight_requests >= self.settings.max_inflight_requests:
+                return self.reject("inflight_requests")
+            self.inflight_requests += 1
+        return None
+
+    def exit_request(self):
+        with self._inflight_lock:
+            self.inflight_requests -= 1
+
+    def check_move_ip(self, client_ip: str) -> Optional[str]:
+        if self.enabled and not self.move_ip_limiter.allow(client_ip):
+            return self.reject("move_ip_rate")
+        return None
+
+    def check_move_player(self, game_id: str, player_id: str) -> Optional[str]:
+        # Only called once the player is known to be on move, so a spoofed id can't drain a real player's bucket
+        if self.enabled and not self.move_player_limiter.allow(f"{game_id}:{player_id}"):
+            return self.reject("move_player_rate")
+        return None
+
+    def check_ws_connect(self, client_ip: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        if self.websocket_connections >= self.settings.max_websocket_connections:
+            return self.reject("websocket_connections")
+        if not self.ws_connect_limiter.allow(client_ip):
+            return self.reject("websocket_connect_rate")
+        return None
+
+    def check_ws_message(self, connection_key: str) -> Optional[str]:
+        if self.enabled and not self.ws_message_limiter.allow(connection_key):
+            return self.reject("websocket_message_rate")
+        return None
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "inflight_requests": self.inflight_requests,
+            "websocket_connections": self.websocket_connections,
+            "rejections": dict(self.rejections),
+            "rejections_total": sum(self.rejections.values())
+        }
+
+admission = AdmissionController(settings)
+
+def client_ip(connection: Union[Request, WebSocket]) -> str:
+    return connection.client.host if connection.client else "unknown"
+
 # CORS Middleware
 allow_credentials = True
 if '*' in settings.cors_origins:
@@ -240,13 +536,37 @@ app.add_middleware(
 )
 
 # Dependency to get database session
-def get_db():
+def get_probe_db():
+    try:
+        get_engine()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Database unavailable: {e}",
+            headers={"Retry-After": str(int(settings.db_retry_backoff))}
+        )
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+def get_db():
+    # Shed before queueing on pool checkout; probes use get_probe_db so they keep answering
+    if admission.enter_request():
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Server is busy, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    try:
+        yield from get_probe_db()
+    finally:
+        admission.exit_request()
+
+# get_db for handlers that only need the database on some paths
+db_session = contextmanager(get_db)
+
 # Fixed helper function - don't manually set UUIDs, let database handle it
 def get_or_create_user(db: Session, username: str, email: str) -> User:
     user = db.query(User).filter(User.username == username).first()
@@ -263,6 +583,7 @@ def get_or_create_user(db: Session, username: str, email: str) -> User:
             else:
                 raise
         db.refresh(user)
+        leaderboard.update_user(user)
     return user
 
 # WebSocket Connection Manager
@@ -291,7 +612,8 @@ class ConnectionManager:
 
     async def broadcast_to_game(self, message: dict, game_id: str):
         if game_id in self.active_connections:
-            for user_id, connection in self.active_connections[game_id].items():
+            # Copy, a disconnect during an await would otherwise resize the dict
+            for user_id, connection in list(self.active_connections[game_id].items()):
                 try:
                     await connection.send_json(message)
                 except Exception as e:
@@ -306,6 +628,1359 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+# Live Game State
+class GameStateStore:
+    """In-memory state of in-flight games, snapshotted to a local file.
+
+    A restarted worker claims a snapshot slot, normally the one its
+    predecessor held, and loads it on boot. Restored games are served as-is
+    until the store is reconciled against the database in one bulk query,
+    so active games resume without rebuilding them from Game/Move rows.
+    """
+    SNAPSHOT_VERSION = 2
+    LIVE_STATUSES = ("waiting", "active")
+    GAME_FIELDS = (
+        "id", "white_player_id", "black_player_id", "status", "current_turn", "fen",
+        "result", "termination", "time_control", "increment", "white_time_left",
+        "black_time_left", "last_move_time", "created_at", "updated_at"
+    )
+    DATETIME_FIELDS = ("last_move_time", "created_at", "updated_at")
+    # Snapshot rows are positional lists in this order to keep the file compact
+    SNAPSHOT_FIELDS = GAME_FIELDS + ("move_count",)
+
+    def __init__(self, path: str):
+        self.base_path = path
+        self.path = path
+        self.games: Dict[str, dict] = {}  # game_id -> state
+        self.dirty = False
+        # True from load() until reconcile(): the database hasn't confirmed these games yet
+        self.restored = False
+        self._lock = threading.Lock()
+        self._slot_file = None
+
+    def _slot_path(self, slot: str, suffix: str) -> str:
+        root, ext = os.path.splitext(self.base_path)
+        return f"{root}.{slot}{suffix or ext}"
+
+    @staticmethod
+    def _try_lock(path: str, create: bool):
+        try:
+            lock_file = open(path, "a" if create else "r")
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        return lock_file
+
+    def claim_slot(self, worker_id: Optional[str] = None, max_slots: int = 1024) -> str:
+        """Point this store at its snapshot file, held for the life of the process"""
+        if worker_id:
+            self.path = self._slot_path(worker_id, "")
+            return self.path
+        for slot in range(max_slots):
+            lock_file = self._try_lock(self._slot_path(str(slot), ".lock"), create=True)
+            if lock_file:
+                self._slot_file = lock_file
+                self.path = self._slot_path(str(slot), "")
+                return self.path
+        raise RuntimeError(f"No free game snapshot slot out of {max_slots}")
+
+    def remove_stale(self) -> int:
+        """Delete old snapshots of slots no running worker holds, returns how many"""
+        root, ext = os.path.splitext(self.base_path)
+        directory, prefix = os.path.split(root)
+        directory = directory or "."
+        removed = 0
+        for name in os.listdir(directory):
+            if not (name.startswith(f"{prefix}.") and name.endswith((ext, f"{ext}.tmp"))):
+                continue
+            path = os.path.join(directory, name)
+            if os.path.abspath(path) in (os.path.abspath(self.path), os.path.abspath(f"{self.path}.tmp")):
+                continue
+            try:
+                if time.time() - os.path.getmtime(path) < settings.snapshot_max_age:
+                    continue
+            except FileNotFoundError:
+                continue
+            slot = name[len(prefix) + 1:].split(".")[0]
+            lock_file = self._try_lock(self._slot_path(slot, ".lock"), create=False)
+            if lock_file is False:
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            finally:
+                if lock_file:
+                    lock_file.close()
+        return removed
+
+    def get(self, game_id: str) -> Optional[dict]:
+        return self.games.get(game_id)
+
+    def get_restored(self, game_id: str) -> Optional[dict]:
+        """Live state restored from the snapshot, served without a database check until reconcile"""
+        return self.games.get(game_id) if self.restored else None
+
+    def update(self, game: Game, move_count: Optional[int] = None):
+        """Record the committed state of a game, dropping it once it is no longer live"""
+        game_id = str(game.id)
+        with self._lock:
+            self.dirty = True
+            if game.status not in self.LIVE_STATUSES:
+                self.games.pop(game_id, None)
+                return
+            state = {field: getattr(game, field) for field in self.GAME_FIELDS}
+            for field in ("id", "white_player_id", "black_player_id"):
+                state[field] = str(state[field]) if state[field] is not None else None
+            if move_count is None:
+                previous = self.games.get(game_id)
+                move_count = previous["move_count"] if previous else 0
+            state["move_count"] = move_count
+            self.games[game_id] = state
+
+    def get_current(self, game_id: str, updated_at: Optional[datetime]) -> Optional[dict]:
+        """Live state only if it matches the database's updated_at for the game"""
+        state = self.games.get(game_id)
+        if state and updated_at is not None and state["updated_at"] == updated_at:
+            return state
+        return None
+
+    def next_move_number(self, game: Game) -> Optional[int]:
+        """Move number from live state, or None if the state may be stale"""
+        state = self.games.get(str(game.id))
+        if state and state["fen"] == game.fen and state["updated_at"] == game.updated_at:
+            return state["move_count"] + 1
+        return None
+
+    def to_response(self, state: dict) -> "GameResponse":
+        return GameResponse(**{field: state[field] for field in GameResponse.__fields__})
+
+    def save(self):
+        with self._lock:
+            states = list(self.games.values())
+            self.dirty = False
+        rows = []
+        for state in states:
+            row = dict(state)
+            for field in self.DATETIME_FIELDS:
+                row[field] = row[field].isoformat() if row[field] else None
+            rows.append([row[field] for field in self.SNAPSHOT_FIELDS])
+        payload = {
+            "version": self.SNAPSHOT_VERSION,
+            "written_at": datetime.utcnow().isoformat(),
+            "fields": list(self.SNAPSHOT_FIELDS),
+            "games": rows
+        }
+        # Write then rename so a crash mid-write never leaves a truncated snapshot
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> int:
+        """Restore live games from the snapshot file, returns how many were loaded"""
+        try:
+            with open(self.path) as f:
+                payload = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            logger.error(f"Ignoring unreadable game snapshot {self.path}: {e}")
+            return 0
+        if payload.get("version") != self.SNAPSHOT_VERSION:
+            logger.warning(f"Ignoring game snapshot with version {payload.get('version')}")
+            return 0
+        age = (datetime.utcnow() - datetime.fromisoformat(payload["written_at"])).total_seconds()
+        if age > settings.snapshot_max_age:
+            logger.warning(f"Ignoring game snapshot {self.path} written {age:.0f}s ago")
+            return 0
+        fields = payload["fields"]
+        games = {}
+        for row in payload["games"]:
+            state = dict(zip(fields, row))
+            for field in self.DATETIME_FIELDS:
+                state[field] = datetime.fromisoformat(state[field]) if state[field] else None
+            games[state["id"]] = state
+        with self._lock:
+            self.games = games
+            self.restored = bool(games)
+        return len(games)
+
+    def reconcile(self, db: Session) -> int:
+        """Replace live state with the database's view of all in-flight games"""
+        games = db.query(Game).filter(Game.status.in_(self.LIVE_STATUSES)).all()
+        move_counts = dict(
+            db.query(Move.game_id, func.count(Move.id))
+            .join(Game, Game.id == Move.game_id)
+            .filter(Game.status.in_(self.LIVE_STATUSES))
+            .group_by(Move.game_id)
+            .all()
+        )
+        restored = {}
+        for game in games:
+            state = {field: getattr(game, field) for field in self.GAME_FIELDS}
+            for field in ("id", "white_player_id", "black_player_id"):
+                state[field] = str(state[field]) if state[field] is not None else None
+            state["move_count"] = move_counts.get(game.id, 0)
+            restored[state["id"]] = state
+        with self._lock:
+            self.games = restored
+            self.restored = False
+            self.dirty = True
+        return len(restored)
+
+game_states = GameStateStore(settings.snapshot_path)
+
+def reconcile_game_states():
+    db = SessionLocal()
+    try:
+        count = game_states.reconcile(db)
+        logger.info(f"Reconciled {count} in-flight games with the database")
+    except Exception as e:
+        logger.error(f"Failed to reconcile game states: {e}")
+    finally:
+        db.close()
+
+async def snapshot_game_states():
+    try:
+        await asyncio.to_thread(game_states.save)
+    except Exception as e:
+        logger.error(f"Failed to write game snapshot: {e}")
+
+async def snapshot_loop():
+    while True:
+        await asyncio.sleep(settings.snapshot_interval)
+        if game_states.dirty:
+            await snapshot_game_states()
+
+# Cold Storage for Finished Games
+class GameArchive:
+    """Finished games moved out of the hot games/moves tables.
+
+    Games are grouped into monthly partitions by when they finished. Each
+    partition is a pack file of zlib-compressed records (the game row plus a
+    packed move list of UCI moves and clocks; SAN and FENs are rebuilt on
+    read) and an append-only index file mapping game ids to record offsets.
+    Index lines also carry a result summary so aggregates (the leaderboard)
+    can be rebuilt by streaming the index files instead of the packs.
+
+    Ids are resolved through a sorted binary lookup file per partition,
+    binary-searched through mmap, plus the few index lines appended since it
+    was last merged, so memory doesn't grow with the size of the archive.
+    """
+    DATETIME_FIELDS = ("last_move_time", "created_at", "updated_at")
+    LOOKUP_MAGIC = b"GAL1"
+    LOOKUP_HEADER = struct.Struct("<4sQI")  # magic, .idx bytes merged, entry count
+    LOOKUP_ENTRY = struct.Struct("<16sQI")  # game id, pack offset, record length
+    # Index lines past the lookup file are held in memory until they are merged
+    MERGE_TAIL_BYTES = 1 << 20
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.partitions: Dict[str, dict] = {}  # partition -> lookup mmap, merged bytes, unmerged tail
+        self._lock = threading.Lock()
+
+    def _path(self, partition: str, extension: str) -> str:
+        return os.path.join(self.directory, f"games-{partition}.{extension}")
+
+    def _partition_names(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            (name[len("games-"):-len(".idx")] for name in os.listdir(self.directory)
+             if name.startswith("games-") and name.endswith(".idx")),
+            reverse=True
+        )
+
+    @staticmethod
+    def _id_key(game_id: str) -> Optional[bytes]:
+        try:
+            return uuid.UUID(game_id).bytes
+        except ValueError:
+            return None
+
+    def _open_lookup(self, partition: str) -> dict:
+        path = self._path(partition, "lookup")
+        state = {"lookup": None, "lookup_stat": None, "entries": 0, "merged": 0}
+        try:
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if stat.st_size >= self.LOOKUP_HEADER.size:
+                    lookup = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    magic, merged, entries = self.LOOKUP_HEADER.unpack_from(lookup)
+                    if magic == self.LOOKUP_MAGIC:
+                        state.update(lookup=lookup, lookup_stat=(stat.st_ino, stat.st_mtime_ns),
+                                     entries=entries, merged=merged)
+        except FileNotFoundError:
+            pass
+        state["read_to"] = state["merged"]
+        state["tail"] = {}  # game_id -> (offset, length) for lines past the lookup file
+        return state
+
+    def _read_lines(self, partition: str, start: int):
+        """Yield (end offset, parsed line) for complete index lines from start"""
+        with open(self._path(partition, "idx"), "rb") as f:
+            f.seek(start)
+            position = start
+            for line in f:
+                # Only consume complete lines, another worker may be mid-append
+                if not line.endswith(b"\n"):
+                    return
+                position += len(line)
+                yield position, json.loads(line)
+
+    def load_index(self) -> int:
+        """Pick up lookup files and index lines written since the last call, returns how many games were added"""
+        added = 0
+        for partition in self._partition_names():
+            state = self.partitions.get(partition)
+            before = state["entries"] + len(state["tail"]) if state else 0
+            try:
+                stat = os.stat(self._path(partition, "lookup"))
+                lookup_stat = (stat.st_ino, stat.st_mtime_ns)
+            except FileNotFoundError:
+                lookup_stat = None
+            if state is None or state["lookup_stat"] != lookup_stat:
+                state = self._open_lookup(partition)
+            for position, (game_id, offset, length, *_) in self._read_lines(partition, state["read_to"]):
+                state["tail"][game_id] = (offset, length)
+                state["read_to"] = position
+            self.partitions[partition] = state
+            added += state["entries"] + len(state["tail"]) - before
+        return added
+
+    def count(self) -> int:
+        return sum(state["entries"] + len(state["tail"]) for state in self.partitions.values())
+
+    def _search(self, lookup, entries: int, key: bytes) -> Optional[tuple]:
+        low, high = 0, entries
+        while low < high:
+            middle = (low + high) // 2
+            position = self.LOOKUP_HEADER.size + middle * self.LOOKUP_ENTRY.size
+            candidate = lookup[position:position + 16]
+            if candidate < key:
+                low = middle + 1
+            elif candidate > key:
+                high = middle
+            else:
+                return self.LOOKUP_ENTRY.unpack_from(lookup, position)[1:]
+        return None
+
+    def _find(self, game_id: str) -> Optional[tuple]:
+        key = self._id_key(game_id)
+        if key is None:
+            return None
+        for partition, state in list(self.partitions.items()):
+            location = state["tail"].get(game_id)
+            if location is None and state["lookup"] is not None:
+                location = self._search(state["lookup"], state["entries"], key)
+            if location is not None:
+                return (partition, *location)
+        return None
+
+    def merge(self, min_tail_bytes: int = 0) -> int:
+        """Fold index lines past each lookup file into it, returns how many partitions were rewritten"""
+        merged_partitions = 0
+        if not self._partition_names():
+            return 0
+        with self.exclusive():
+            for partition in self._partition_names():
+                state = self._open_lookup(partition)
+                if os.path.getsize(self._path(partition, "idx")) - state["merged"] <= min_tail_bytes:
+                    continue
+                tail = {}
+                merged = state["merged"]
+                for position, (game_id, offset, length, *_) in self._read_lines(partition, merged):
+                    key = self._id_key(game_id)
+                    if key is not None:
+                        tail[key] = (offset, length)
+                    merged = position
+                if merged == state["merged"]:
+                    continue
+                existing = (
+                    self.LOOKUP_ENTRY.unpack_from(
+                        state["lookup"], self.LOOKUP_HEADER.size + i * self.LOOKUP_ENTRY.size)
+                    for i in range(state["entries"])
+                )
+                rows = heapq.merge(
+                    (entry for entry in existing if entry[0] not in tail),
+                    sorted((key, offset, length) for key, (offset, length) in tail.items())
+                )
+                tmp_path = f"{self._path(partition, 'lookup')}.tmp"
+                entries = 0
+                with open(tmp_path, "wb") as f:
+                    f.write(self.LOOKUP_HEADER.pack(self.LOOKUP_MAGIC, 0, 0))
+                    for row in rows:
+                        f.write(self.LOOKUP_ENTRY.pack(*row))
+                        entries += 1
+                    f.seek(0)
+                    f.write(self.LOOKUP_HEADER.pack(self.LOOKUP_MAGIC, merged, entries))
+                    f.flush()
+                    os.fsync(f.fileno())
+                if state["lookup"] is not None:
+                    state["lookup"].close()
+                os.replace(tmp_path, self._path(partition, "lookup"))
+                merged_partitions += 1
+        self.load_index()
+        return merged_partitions
+
+    def _read(self, game_id: str, refresh: bool) -> Optional[dict]:
+        location = self._find(game_id)
+        if location is None and refresh and self.load_index():
+            location = self._find(game_id)
+        if location is None:
+            return None
+        partition, offset, length = location
+        with open(self._path(partition, "pack"), "rb") as f:
+            f.seek(offset)
+            record = json.loads(zlib.decompress(f.read(length)))
+        for field in self.DATETIME_FIELDS:
+            value = record["game"].get(field)
+            record["game"][field] = datetime.fromisoformat(value) if value else None
+        return record
+
+    def get_game(self, game_id: str, refresh: bool = False) -> Optional[dict]:
+        record = self._read(game_id, refresh)
+        return record["game"] if record else None
+
+    def get_moves(self, game_id: str, refresh: bool = False) -> Optional[List[dict]]:
+        record = self._read(game_id, refresh)
+        if not record:
+            return None
+        game, packed = record["game"], record["moves"]
+        board = chess.Board(packed["start_fen"])
+        moves = []
+        for i, uci in enumerate(packed["uci"]):
+            chess_move = chess.Move.from_uci(uci)
+            fen_before = board.fen()
+            player_id = game["white_player_id"] if board.turn == chess.WHITE else game["black_player_id"]
+            san_notation = board.san(chess_move)
+            board.push(chess_move)
+            moves.append({
+                "id": packed["ids"][i],
+                "game_id": game["id"],
+                "player_id": player_id,
+                "move_notation": uci,
+                "san_notation": san_notation,
+                "fen_before": fen_before,
+                "fen_after": board.fen(),
+                "move_number": packed["move_numbers"][i],
+                "white_time_left": packed["white_time_left"][i],
+                "black_time_left": packed["black_time_left"][i],
+                "timestamp": datetime.fromisoformat(packed["timestamps"][i]) if packed["timestamps"][i] else None
+            })
+        return moves
+
+    def results(self):
+        """Stream [white_id, black_id, time_control, increment, result] for every archived game"""
+        for partition in self._partition_names():
+            for _, (game_id, offset, length, *summary) in self._read_lines(partition, 0):
+                # Legacy lines have no summary and are left out of aggregates
+                if summary:
+                    yield summary
+
+    @staticmethod
+    def _pack(game: Game, moves: List[Move]) -> dict:
+        return jsonable_encoder({
+            "game": {column.name: getattr(game, column.name) for column in Game.__table__.columns},
+            "moves": {
+                "start_fen": moves[0].fen_before if moves else chess.STARTING_FEN,
+                "ids": [move.id for move in moves],
+                "move_numbers": [move.move_number for move in moves],
+                "uci": [move.move_notation for move in moves],
+                "white_time_left": [move.white_time_left for move in moves],
+                "black_time_left": [move.black_time_left for move in moves],
+                "timestamps": [move.timestamp for move in moves]
+            }
+        })
+
+    @contextmanager
+    def exclusive(self):
+        """Lock shared by every process archiving into this directory"""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, "archive.lock"), "a") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def archive(self, db: Session, cutoff: datetime, batch_size: int) -> int:
+        """Move one batch of games finished before cutoff into the archive"""
+        # The file lock covers select -> write -> delete so workers never
+        # interleave appends; SKIP LOCKED keeps two workers off the same rows
+        with self.exclusive():
+            games = db.query(Game).filter(
+                Game.status == "finished",
+                Game.updated_at < cutoff
+            ).order_by(Game.updated_at).limit(batch_size).with_for_update(skip_locked=True).all()
+            if not games:
+                db.rollback()
+                return 0
+            game_ids = [game.id for game in games]
+            moves_by_game: Dict[str, List[Move]] = {}
+            for move in db.query(Move).filter(Move.game_id.in_(game_ids)).order_by(Move.game_id, Move.move_number):
+                moves_by_game.setdefault(move.game_id, []).append(move)
+
+            partitions: Dict[str, List[Game]] = {}
+            for game in games:
+                partitions.setdefault((game.updated_at or game.created_at).strftime("%Y-%m"), []).append(game)
+
+            # Records are durable on disk before the hot rows are deleted
+            for partition, partition_games in partitions.items():
+                entries = []
+                with open(self._path(partition, "pack"), "ab") as pack:
+                    offset = os.fstat(pack.fileno()).st_size
+                    for game in partition_games:
+                        data = zlib.compress(json.dumps(
+                            self._pack(game, moves_by_game.get(game.id, [])),
+                            separators=(",", ":")
+                        ).encode())
+                        summary = [
+                            str(game.white_player_id),
+                            str(game.black_player_id) if game.black_player_id else None,
+                            game.time_control,
+                            game.increment,
+                            game.result
+                        ]
+                        entries.append((str(game.id), offset, len(data), summary))
+                        pack.write(data)
+                        offset += len(data)
+                    pack.flush()
+                    os.fsync(pack.fileno())
+                with open(self._path(partition, "idx"), "ab") as index_file:
+                    for game_id, offset, length, summary in entries:
+                        index_file.write(json.dumps([game_id, offset, length, *summary]).encode() + b"\n")
+                    index_file.flush()
+                    os.fsync(index_file.fileno())
+
+            db.query(Move).filter(Move.game_id.in_(game_ids)).delete(synchronize_session=False)
+            db.query(Game).filter(Game.id.in_(game_ids)).delete(synchronize_session=False)
+            db.commit()
+        self.load_index()
+        # Keep each worker's in-memory tail small
+        self.merge(self.MERGE_TAIL_BYTES)
+        return len(games)
+
+game_archive = GameArchive(settings.archive_dir)
+
+def load_game_archive():
+    try:
+        # Partitions from before lookup files existed are merged once, off the request path
+        game_archive.merge(GameArchive.MERGE_TAIL_BYTES)
+        archived = game_archive.load_index()
+        if archived:
+            logger.info(f"Loaded archive index with {archived} games")
+    except Exception as e:
+        logger.error(f"Failed to load the game archive index: {e}")
+
+def archive_finished_games() -> int:
+    if not settings.archive_configured:
+        logger.warning("Not archiving finished games: ARCHIVE_DIR is not set to shared storage")
+        return 0
+    get_engine()
+    db = SessionLocal()
+    total = 0
+    try:
+        cutoff = datetime.utcnow() - timedelta(days=settings.archive_after_days)
+        while True:
+            archived = game_archive.archive(db, cutoff, settings.archive_batch_size)
+            total += archived
+            if archived < settings.archive_batch_size:
+                break
+        if total:
+            logger.info(f"Archived {total} finished games")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to archive finished games: {e}")
+    finally:
+        db.close()
+    return total
+
+async def archive_loop():
+    while True:
+        await asyncio.sleep(settings.archive_interval)
+        if db_state["ready"]:
+            await asyncio.to_thread(archive_finished_games)
+
+# Response Cache for Game Reads
+def move_payload(move: Move) -> dict:
+    """GET /moves shape of a move row; archived moves are rebuilt with the same keys"""
+    return {column.name: getattr(move, column.name) for column in Move.__table__.columns}
+
+class GameResponseCache:
+    """Version-stamped cache of GET /games/{game_id} and /moves payloads.
+
+    The game payload is versioned by its updated_at and the move list by its
+    length (moves are append-only). Writes update entries in place, so a
+    poll for an unchanged game is answered from memory, or with a 304 when
+    the client sends the matching ETag. The TTL bounds staleness when other
+    workers write to the same game.
+    """
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()  # game_id -> entry
+
+    @staticmethod
+    def make_etag(*parts) -> str:
+        digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()[:20]
+        return f'"{digest}"'
+
+    @staticmethod
+    def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    def _entry(self, game_id: str, create: bool = False) -> Optional[dict]:
+        entry = self.entries.get(game_id)
+        now = time.monotonic()
+        if entry is not None and entry["expires_at"] <= now:
+            del self.entries[game_id]
+            entry = None
+        if entry is None and create:
+            entry = {"game": None, "game_etag": None, "moves": None, "expires_at": now + self.ttl}
+            self.entries[game_id] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        if entry is not None:
+            self.entries.move_to_end(game_id)
+        return entry
+
+    def get_game(self, game_id: str) -> Optional[dict]:
+        entry = self._entry(game_id)
+        return entry if entry and entry["game"] is not None else None
+
+    def get_moves(self, game_id: str) -> Optional[List[dict]]:
+        entry = self._entry(game_id)
+        return entry["moves"] if entry else None
+
+    def store_game(self, game_response: "GameResponse") -> dict:
+        entry = self._entry(game_response.id, create=True)
+        entry["game"] = jsonable_encoder(game_response)
+        entry["game_etag"] = self.make_etag(game_response.id, game_response.updated_at.isoformat())
+        entry["expires_at"] = time.monotonic() + self.ttl
+        return entry
+
+    def store_moves(self, game_id: str, moves: List[dict]) -> List[dict]:
+        entry = self._entry(game_id, create=True)
+        entry["moves"] = jsonable_encoder(moves)
+        return entry["moves"]
+
+    def record_move(self, game_response: "GameResponse", move: Move):
+        """Called after a move commits: refresh the game and extend the cached move list"""
+        moves = self.get_moves(game_response.id)
+        entry = self.store_game(game_response)
+        if moves is not None and len(moves) == move.move_number - 1:
+            moves.append(jsonable_encoder(move_payload(move)))
+        else:
+            entry["moves"] = None
+
+    def invalidate(self, game_id: str):
+        self.entries.pop(game_id, None)
+
+    def moves_etag(self, game_id: str, moves: List[dict], since: Optional[int]) -> str:
+        return self.make_etag(game_id, "moves", len(moves), since)
+
+game_cache = GameResponseCache(settings.game_cache_ttl, settings.game_cache_max_entries)
+
+def cache_committed_game(game: Game, move: Optional[Move] = None):
+    """Write-through after a commit; a game that fails validation is just evicted"""
+    try:
+        game_response = GameResponse.from_orm(game)
+    except ValueError as e:
+        logger.warning(f"Not caching game {game.id}: {e}")
+        game_cache.invalidate(str(game.id))
+        return
+    if move is not None:
+        game_cache.record_move(game_response, move)
+    else:
+        game_cache.store_game(game_response)
+
+# Leaderboard
+def game_outcomes(result: Optional[str]) -> tuple:
+    """(white outcome, black outcome) as "wins"/"draws"/"losses" for a game result"""
+    return {
+        "white_wins": ("wins", "losses"),
+        "black_wins": ("losses", "wins"),
+    }.get(result, ("draws", "draws"))
+
+def time_control_category(time_control: int, increment: int) -> str:
+    # Estimated game duration assuming 40 moves, as most chess servers do
+    estimated = time_control + 40 * increment
+    if estimated < 180:
+        return "bullet"
+    if estimated < 480:
+        return "blitz"
+    if estimated < 1500:
+        return "rapid"
+    return "classical"
+
+class _SkipListEnd:
+    """Tail sentinel that sorts after every key"""
+    def __lt__(self, other):
+        return False
+
+    def __le__(self, other):
+        return False
+
+class _SkipListNode:
+    __slots__ = ("key", "value", "next", "width")
+
+    def __init__(self, key, value, levels: int, end=None):
+        self.key = key
+        self.value = value
+        self.next = [end] * levels
+        # width[i] = number of level-0 steps skipped by next[i]
+        self.width = [1] * levels
+
+class IndexableSkipList:
+    """Sorted map with O(log n) insert, remove, rank and index lookups"""
+    MAX_LEVELS = 24
+
+    def __init__(self):
+        self._end = _SkipListNode(_SkipListEnd(), None, 0)
+        self.head = _SkipListNode(None, None, self.MAX_LEVELS, self._end)
+        self.size = 0
+        self._random = random.Random()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVELS and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    def insert(self, key, value):
+        chain = [None] * self.MAX_LEVELS
+        steps_at_level = [0] * self.MAX_LEVELS
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+        levels = self._random_level()
+        new_node = _SkipListNode(key, value, levels)
+        steps = 0
+        for level in range(levels):
+            previous = chain[level]
+            new_node.next[level] = previous.next[level]
+            previous.next[level] = new_node
+            new_node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self.MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain = [None] * self.MAX_LEVELS
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+        target = chain[0].next[0]
+        if target is self._end or target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+        for level in range(len(target.next), self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def rank(self, key) -> Optional[int]:
+        """0-based position of key, or None if absent"""
+        position = 0
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        target = node.next[0]
+        if target is self._end or target.key != key:
+            return None
+        return position
+
+    def slice(self, start: int, count: int) -> List[tuple]:
+        """(key, value) pairs at positions start .. start + count - 1"""
+        if start >= self.size or count <= 0:
+            return []
+        node = self.head
+        remaining = start + 1
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.width[level] <= remaining and node.next[level] is not self._end:
+                remaining -= node.width[level]
+                node = node.next[level]
+        items = []
+        while node is not self._end and len(items) < count:
+            items.append((node.key, node.value))
+            node = node.next[0]
+        return items
+
+class Leaderboard:
+    """Ranked players, overall and per time control category.
+
+    The overall board orders users by rating then games won; category
+    boards order players by score (2 per win, 1 per draw) in finished games
+    of that category. Boards are rebuilt in bulk at startup and then updated
+    incrementally as games finish. Periodic rebuilds pick up games finished
+    on other workers.
+    """
+    BOARDS = ("overall", "bullet", "blitz", "rapid", "classical")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (game_id, update, args) applied while a rebuild is reading the database
+        self._pending: Optional[List[tuple]] = None
+        self._reset()
+
+    def _reset(self):
+        self.users: Dict[str, dict] = {}  # user_id -> username, rating, games_played, games_won
+        self.category_stats: Dict[str, Dict[str, dict]] = {board: {} for board in self.BOARDS[1:]}
+        self.boards: Dict[str, IndexableSkipList] = {board: IndexableSkipList() for board in self.BOARDS}
+        self.keys: Dict[str, Dict[str, tuple]] = {board: {} for board in self.BOARDS}  # board -> user_id -> key
+
+    def _key(self, board: str, user_id: str) -> Optional[tuple]:
+        user = self.users.get(user_id)
+        if user is None:
+            return None
+        if board == "overall":
+            return (-(user["rating"] or 0), -(user["games_won"] or 0), user["username"], user_id)
+        stats = self.category_stats[board].get(user_id)
+        if not stats:
+            return None
+        score = 2 * stats["wins"] + stats["draws"]
+        return (-score, -stats["wins"], -(user["rating"] or 0), user["username"], user_id)
+
+    def _rekey(self, board: str, user_id: str):
+        old_key = self.keys[board].pop(user_id, None)
+        if old_key is not None:
+            self.boards[board].remove(old_key)
+        key = self._key(board, user_id)
+        if key is not None:
+            self.boards[board].insert(key, user_id)
+            self.keys[board][user_id] = key
+
+    def _set_user(self, user_id: str, username: str, rating: int, games_played: int, games_won: int):
+        self.users[user_id] = {
+            "username": username,
+            "rating": rating,
+            "games_played": games_played,
+            "games_won": games_won
+        }
+
+    def _add_result(self, category: str, user_id: str, outcome: str):
+        stats = self.category_stats[category].setdefault(
+            user_id, {"games": 0, "wins": 0, "draws": 0, "losses": 0})
+        stats["games"] += 1
+        stats[outcome] += 1
+
+    def _apply(self, game_id: Optional[str], update, *args):
+        update(*args)
+        if self._pending is not None:
+            self._pending.append((game_id, update, args))
+
+    def _update_user(self, user_id: str, username: str, rating: int, games_played: int, games_won: int):
+        self._set_user(user_id, username, rating, games_played, games_won)
+        for board in self.BOARDS:
+            self._rekey(board, user_id)
+
+    def _record_game(self, category: str, player_ids: tuple, result: Optional[str], users: List[tuple]):
+        for user in users:
+            self._set_user(*user)
+        for user_id, outcome in zip(player_ids, game_outcomes(result)):
+            self._add_result(category, user_id, outcome)
+            self._rekey("overall", user_id)
+            self._rekey(category, user_id)
+
+    def update_user(self, user: User):
+        with self._lock:
+            self._apply(None, self._update_user,
+                        str(user.id), user.username, user.rating, user.games_played, user.games_won)
+
+    def on_game_finished(self, game: Game, players: List[User]):
+        """Apply a finished game; players are the User rows whose stats changed"""
+        if game.black_player_id is None:
+            return
+        category = time_control_category(game.time_control, game.increment)
+        player_ids = (str(game.white_player_id), str(game.black_player_id))
+        users = [
+            (str(user.id), user.username, user.rating, user.games_played, user.games_won)
+            for user in players if user is not None
+        ]
+        with self._lock:
+            self._apply(str(game.id), self._record_game, category, player_ids, game.result, users)
+
+    def _pending_game_ids(self, checked: set) -> set:
+        return {game_id for game_id, _, _ in self._pending if game_id is not None} - checked
+
+    def rebuild(self, db: Session):
+        """Reload every board from users, finished games and the archive.
+
+        The queries and the new boards are built outside the lock. Updates
+        applied meanwhile are buffered and replayed on the new boards, except
+        games the queries already counted: those are looked up by id in the
+        same database snapshot as the counts.
+        """
+        with self._lock:
+            self._pending = []
+        checked: set = set()
+        counted: set = set()
+        try:
+            if db.get_bind().dialect.name == "postgresql":
+                # Every query below has to see the same snapshot
+                db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            users = db.query(
+                User.id, User.username, User.rating, User.games_played, User.games_won
+            ).filter(User.is_active.isnot(False)).all()
+            results = []
+            # Archival moves games out under this lock, so each game is counted exactly once
+            with game_archive.exclusive():
+                for player_column, color in ((Game.white_player_id, 0), (Game.black_player_id, 1)):
+                    for player_id, time_control, increment, result, count in db.query(
+                        player_column, Game.time_control, Game.increment, Game.result, func.count(Game.id)
+                    ).filter(
+                        Game.status == "finished", Game.black_player_id.isnot(None)
+                    ).group_by(player_column, Game.time_control, Game.increment, Game.result):
+                        results.append((str(player_id), color, time_control, increment, result, count))
+                # Streamed and counted per player, so memory doesn't grow with the archive
+                archived: Dict[tuple, int] = {}
+                for white_id, black_id, time_control, increment, result in game_archive.results():
+                    if black_id:
+                        for key in ((white_id, 0, time_control, increment, result),
+                                    (black_id, 1, time_control, increment, result)):
+                            archived[key] = archived.get(key, 0) + 1
+            results.extend(key + (count,) for key, count in archived.items())
+
+            fresh = Leaderboard()
+            for user_id, username, rating, games_played, games_won in users:
+                fresh._set_user(str(user_id), username, rating, games_played, games_won)
+            for user_id, color, time_control, increment, result, count in results:
+                category = time_control_category(time_control, increment)
+                outcome = game_outcomes(result)[color]
+                stats = fresh.category_stats[category].setdefault(
+                    user_id, {"games": 0, "wins": 0, "draws": 0, "losses": 0})
+                stats["games"] += count
+                stats[outcome] += count
+            for board in self.BOARDS:
+                for user_id in fresh.users:
+                    fresh._rekey(board, user_id)
+
+            while True:
+                with self._lock:
+                    unchecked = self._pending_game_ids(checked)
+                    if not unchecked:
+                        pending, self._pending = self._pending, None
+                        self.users, self.category_stats = fresh.users, fresh.category_stats
+                        self.boards, self.keys = fresh.boards, fresh.keys
+                        for game_id, update, args in pending:
+                            if game_id not in counted:
+                                update(*args)
+                        break
+                counted.update(
+                    str(game_id) for game_id, in db.query(Game.id).filter(
+                        Game.id.in_(unchecked), Game.status == "finished")
+                )
+                checked |= unchecked
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self._pending = None
+            raise
+
+    def _entry(self, board: str, rank: int, user_id: str) -> dict:
+        entry = {"rank": rank, "user_id": user_id, **self.users[user_id]}
+        if board != "overall":
+            entry.update(self.category_stats[board][user_id])
+            entry["score"] = 2 * entry["wins"] + entry["draws"]
+        return entry
+
+    def top(self, board: str, skip: int, limit: int) -> List[dict]:
+        with self._lock:
+            return [
+                self._entry(board, skip + i + 1, user_id)
+                for i, (_, user_id) in enumerate(self.boards[board].slice(skip, limit))
+            ]
+
+    def rank(self, board: str, user_id: str) -> Optional[dict]:
+        with self._lock:
+            key = self.keys[board].get(user_id)
+            if key is None:
+                return None
+            return self._entry(board, self.boards[board].rank(key) + 1, user_id)
+
+leaderboard = Leaderboard()
+
+def rebuild_leaderboard():
+    db = SessionLocal()
+    try:
+        leaderboard.rebuild(db)
+        logger.info(f"Leaderboard rebuilt with {len(leaderboard.users)} players")
+    except Exception as e:
+        logger.error(f"Failed to rebuild leaderboard: {e}")
+    finally:
+        db.close()
+
+async def leaderboard_loop():
+    while True:
+        await asyncio.sleep(settings.leaderboard_rebuild_interval)
+        if db_state["ready"]:
+            await asyncio.to_thread(rebuild_leaderboard)
+
+# Arena Tournaments
+class ArenaTournament:
+    """An arena event: players are re-paired as soon as their game ends"""
+    def __init__(self, name: str, time_control: int, increment: int, duration_minutes: int):
+        self.id = str(uuid.uuid4())
+        self.name = name
+        self.time_control = time_control
+        self.increment = increment
+        self.duration_minutes = duration_minutes
+        self.status = "waiting"  # waiting -> running -> finished
+        self.created_at = datetime.utcnow()
+        self.starts_at: Optional[datetime] = None
+        self.ends_at: Optional[datetime] = None
+        self.players: Dict[str, dict] = {}  # user_id -> standing
+        self.waiting: set = set()  # user_ids available for the next pairing wave
+        self.games: Dict[str, tuple] = {}  # game_id -> (white_id, black_id), ongoing only
+
+    def add_player(self, user: User) -> dict:
+        user_id = str(user.id)
+        standing = self.players.get(user_id)
+        if standing is None:
+            standing = {
+                "user_id": user_id,
+                "username": user.username,
+                "rating": user.rating,
+                "score": 0,
+                "games": 0,
+                "wins": 0,
+                "draws": 0,
+                "losses": 0,
+                "whites": 0,
+                "blacks": 0,
+                "last_opponent": None,
+                "current_game": None,
+                "active": True
+            }
+            self.players[user_id] = standing
+        standing["active"] = True
+        if standing["current_game"] is None and self.status != "finished":
+            self.waiting.add(user_id)
+        return standing
+
+    def remove_player(self, user_id: str):
+        standing = self.players.get(user_id)
+        if standing:
+            standing["active"] = False
+        self.waiting.discard(user_id)
+
+    def take_pairings(self) -> List[tuple]:
+        """Pair waiting players by score, avoiding immediate rematches.
+
+        Paired players leave the waiting pool; the caller puts them back
+        with release() if their game can't be created.
+        """
+        candidates = sorted(
+            (self.players[user_id] for user_id in self.waiting),
+            key=lambda p: (-p["score"], -(p["rating"] or 0))
+        )
+        pairings = []
+        while len(candidates) >= 2:
+            first = candidates.pop(0)
+            opponent_index = next(
+                (i for i, p in enumerate(candidates) if p["user_id"] != first["last_opponent"]),
+                None
+            )
+            if opponent_index is None:
+                # Only a rematch is available, wait for the next wave
+                continue
+            second = candidates.pop(opponent_index)
+            # Whoever has had white more often takes black
+            if first["whites"] - first["blacks"] > second["whites"] - second["blacks"]:
+                first, second = second, first
+            pairings.append((first["user_id"], second["user_id"]))
+            self.waiting.discard(first["user_id"])
+            self.waiting.discard(second["user_id"])
+        return pairings
+
+    def release(self, user_ids: List[str]):
+        for user_id in user_ids:
+            if self.players[user_id]["active"] and self.status == "running":
+                self.waiting.add(user_id)
+
+    def start_game(self, game_id: str, white_id: str, black_id: str):
+        self.games[game_id] = (white_id, black_id)
+        for user_id, opponent_id, color in ((white_id, black_id, "whites"), (black_id, white_id, "blacks")):
+            standing = self.players[user_id]
+            standing["current_game"] = game_id
+            standing["last_opponent"] = opponent_id
+            standing[color] += 1
+
+    def finish_game(self, game_id: str, result: Optional[str]) -> List[dict]:
+        """Record a result and return the two updated standings"""
+        white_id, black_id = self.games.pop(game_id)
+        updated = []
+        for user_id, outcome in zip((white_id, black_id), game_outcomes(result)):
+            standing = self.players[user_id]
+            standing[outcome] += 1
+            standing["games"] += 1
+            standing["score"] += TournamentManager.POINTS[outcome]
+            standing["current_game"] = None
+            if standing["active"] and self.status == "running":
+                self.waiting.add(user_id)
+            updated.append(standing)
+        return updated
+
+    def standings(self) -> List[dict]:
+        ranked = sorted(
+            self.players.values(),
+            key=lambda p: (-p["score"], -p["wins"], -(p["rating"] or 0), p["username"])
+        )
+        return [
+            {"rank": rank, **{k: v for k, v in standing.items() if k not in ("whites", "blacks", "last_opponent")}}
+            for rank, standing in enumerate(ranked, start=1)
+        ]
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "time_control": self.time_control,
+            "increment": self.increment,
+            "duration_minutes": self.duration_minutes,
+            "created_at": self.created_at,
+            "starts_at": self.starts_at,
+            "ends_at": self.ends_at,
+            "players": len(self.players),
+            "ongoing_games": len(self.games)
+        }
+
+class TournamentManager:
+    """In-memory arena tournaments, paired in bulk waves.
+
+    Each wave pairs every waiting player across all running tournaments and
+    creates the games with a single batched INSERT. Tournament events are
+    pushed to /ws/tournaments/{tournament_id}.
+
+    Tournaments live only in this process and are not part of the game
+    snapshot, so they require a single worker and don't survive a restart.
+    """
+    POINTS = {"wins": 2, "draws": 1, "losses": 0}
+
+    def __init__(self):
+        self.tournaments: Dict[str, ArenaTournament] = {}
+        self.game_tournaments: Dict[str, str] = {}  # game_id -> tournament_id
+        self.connections = ConnectionManager()  # tournament_id -> {connection_id: websocket}
+
+    def get(self, tournament_id: str) -> ArenaTournament:
+        tournament = self.tournaments.get(tournament_id)
+        if not tournament:
+            raise HTTPException(status_code=404, detail="Tournament not found")
+        return tournament
+
+    async def broadcast(self, tournament: ArenaTournament, message: dict):
+        await self.connections.broadcast_to_game(jsonable_encoder(message), tournament.id)
+
+    @staticmethod
+    def create_games(pairings: List[tuple]) -> List[Game]:
+        """Insert every paired game in one statement and commit once"""
+        current_time = datetime.utcnow()
+        rows = [
+            {
+                # Ids are generated here so the rows can be matched back to their
+                # pairings without asking RETURNING for parameter order, which has
+                # no sentinel column on this table and would insert row by row
+                "id": str(uuid.uuid4()),
+                "white_player_id": white_id,
+                "black_player_id": black_id,
+                "status": "active",
+                "time_control": tournament.time_control,
+                "increment": tournament.increment,
+                "white_time_left": tournament.time_control,
+                "black_time_left": tournament.time_control,
+                "last_move_time": current_time,
+                "created_at": current_time,
+                "updated_at": current_time
+            }
+            for tournament, white_id, black_id in pairings
+        ]
+        get_engine()
+        db = SessionLocal(expire_on_commit=False)
+        try:
+            games = {
+                str(game.id): game
+                for game in db.scalars(insert(Game).returning(Game), rows)
+            }
+            db.commit()
+            return [games[row["id"]] for row in rows]
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def expire_games(game_ids: List[str]) -> List[tuple]:
+        """Flag games whose side to move is out of time, in one query plus an UPDATE per flagged game.
+
+        Returns (game, flagged) for every game that is over, including games
+        finished elsewhere that this process hasn't seen end.
+        """
+        now = datetime.utcnow()
+        get_engine()
+        db = SessionLocal(expire_on_commit=False)
+        ended = []
+        try:
+            for game in db.query(Game).filter(Game.id.in_(game_ids)).all():
+                if game.status != "active":
+                    ended.append((game, False))
+                    continue
+                clock = "white_time_left" if game.current_turn == "white" else "black_time_left"
+                if (now - game.last_move_time).total_seconds() < getattr(game, clock):
+                    continue
+                values = {
+                    "status": "finished",
+                    "result": "black_wins" if game.current_turn == "white" else "white_wins",
+                    "termination": "timeout",
+                    clock: 0,
+                    "updated_at": now
+                }
+                # Matching updated_at loses the race to a move committed since the read
+                flagged = db.execute(
+                    update(Game)
+                    .where(Game.id == game.id, Game.status == "active", Game.updated_at == game.updated_at)
+                    .values(**values)
+                ).rowcount
+                if flagged:
+                    ended.append((game, values))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        for game, values in ended:
+            if values:
+                for field, value in values.items():
+                    setattr(game, field, value)
+        return [(game, bool(values)) for game, values in ended]
+
+    async def finish_expired_games(self) -> int:
+        if not self.game_tournaments:
+            return 0
+        ended = await asyncio.to_thread(self.expire_games, list(self.game_tournaments))
+        for game, flagged in ended:
+            game_states.update(game)
+            cache_committed_game(game)
+            if flagged:
+                await manager.broadcast_to_game({
+                    "type": "game_ended",
+                    "game": {
+                        "id": str(game.id),
+                        "result": game.result,
+                        "termination": game.termination,
+                        "white_time_left": game.white_time_left,
+                        "black_time_left": game.black_time_left
+                    }
+                }, str(game.id))
+                leaderboard.on_game_finished(game, [])
+            await self.on_game_finished(game)
+        return len(ended)
+
+    async def run_pairing_wave(self) -> int:
+        # Abandoned games are flagged here, so their players are free for this wave
+        try:
+            await self.finish_expired_games()
+        except Exception as e:
+            logger.error(f"Failed to finish expired tournament games: {e}")
+
+        now = datetime.utcnow()
+        for tournament in list(self.tournaments.values()):
+            if tournament.status == "running" and now >= tournament.ends_at:
+                tournament.status = "finished"
+                tournament.waiting.clear()
+                await self.broadcast(tournament, {
+                    "type": "tournament_finished",
+                    "tournament": tournament.summary(),
+                    "standings": tournament.standings()
+                })
+
+        pairings = [
+            (tournament, white_id, black_id)
+            for tournament in self.tournaments.values() if tournament.status == "running"
+            for white_id, black_id in tournament.take_pairings()
+        ]
+        if not pairings:
+            return 0
+        try:
+            games = await asyncio.to_thread(self.create_games, pairings)
+        except Exception as e:
+            logger.error(f"Failed to create tournament games: {e}")
+            for tournament, white_id, black_id in pairings:
+                tournament.release([white_id, black_id])
+            return 0
+
+        started: Dict[str, List[dict]] = {}
+        for (tournament, white_id, black_id), game in zip(pairings, games):
+            game_id = str(game.id)
+            tournament.start_game(game_id, white_id, black_id)
+            self.game_tournaments[game_id] = tournament.id
+            game_states.update(game, move_count=0)
+            started.setdefault(tournament.id, []).append({
+                "game_id": game_id,
+                "white_player_id": white_id,
+                "white_username": tournament.players[white_id]["username"],
+                "black_player_id": black_id,
+                "black_username": tournament.players[black_id]["username"]
+            })
+        for tournament_id, tournament_games in started.items():
+            await self.broadcast(self.tournaments[tournament_id], {
+                "type": "pairings",
+                "games": tournament_games
+            })
+        return len(games)
+
+    async def on_game_finished(self, game: Game):
+        tournament_id = self.game_tournaments.pop(str(game.id), None)
+        if tournament_id is None:
+            return
+        tournament = self.tournaments[tournament_id]
+        updated = tournament.finish_game(str(game.id), game.result)
+        await self.broadcast(tournament, {
+            "type": "game_finished",
+            "game_id": str(game.id),
+            "result": game.result,
+            "termination": game.termination,
+            "players": updated
+        })
+
+    async def pairing_loop(self):
+        while True:
+            await asyncio.sleep(settings.tournament_pairing_interval)
+            try:
+                await self.run_pairing_wave()
+            except Exception as e:
+                logger.error(f"Tournament pairing wave failed: {e}")
+
+tournaments = TournamentManager()
+
 # Chess Game Logic
 class ChessGameLogic:
     @staticmethod
@@ -354,6 +2029,24 @@ async def get_users(skip: int = 0, limit: int = 10, db: Session = Depends(get_db
     users = db.query(User).offset(skip).limit(limit).all()
     return users
 
+# Leaderboard
+@app.get("/leaderboard")
+async def get_leaderboard(time_control: str = "overall", skip: int = 0, limit: int = 10):
+    if time_control not in Leaderboard.BOARDS:
+        raise HTTPException(status_code=400, detail=f"time_control must be one of {', '.join(Leaderboard.BOARDS)}")
+    return {
+        "time_control": time_control,
+        "total": len(leaderboard.boards[time_control]),
+        "entries": leaderboard.top(time_control, max(0, skip), min(max(0, limit), 100))
+    }
+
+@app.get("/leaderboard/users/{user_id}")
+async def get_user_rankings(user_id: str):
+    rankings = {board: leaderboard.rank(board, user_id) for board in Leaderboard.BOARDS}
+    if rankings["overall"] is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return rankings
+
 # Game Management
 @app.post("/games/", response_model=GameResponse)
 async def create_game(game_data: GameCreate, db: Session = Depends(get_db)):
@@ -377,6 +2070,7 @@ async def create_game(game_data: GameCreate, db: Session = Depends(get_db)):
         db.add(db_game)
         db.commit()
         db.refresh(db_game)
+        game_states.update(db_game, move_count=0)
         
         # Create proper response object
         game_response = GameResponse(
@@ -395,6 +2089,7 @@ async def create_game(game_data: GameCreate, db: Session = Depends(get_db)):
             created_at=db_game.created_at,
             updated_at=db_game.updated_at
         )
+        game_cache.store_game(game_response)
         
         return game_response
         
@@ -404,11 +2099,33 @@ async def create_game(game_data: GameCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Failed to create game: {str(e)}")
 
 @app.get("/games/{game_id}", response_model=GameResponse)
-async def get_game(game_id: str, db: Session = Depends(get_db)):
-    game = db.query(Game).filter(Game.id == game_id).first()
-    if not game:
-        raise HTTPException(status_code=404, detail="Game not found")
-    return game
+async def get_game(game_id: str, request: Request, response: Response):
+    entry = game_cache.get_game(game_id)
+    if entry is None:
+        # Until reconcile, games restored from the snapshot are served without the database
+        restored_state = game_states.get_restored(game_id)
+        archived_game = None if restored_state else game_archive.get_game(game_id)
+        if restored_state:
+            entry = game_cache.store_game(game_states.to_response(restored_state))
+        elif archived_game:
+            entry = game_cache.store_game(GameResponse(**archived_game))
+        else:
+            with db_session() as db:
+                game = db.query(Game).filter(Game.id == game_id).first()
+                if game:
+                    entry = game_cache.store_game(GameResponse.from_orm(game))
+                else:
+                    # Another worker may have archived it since our index was loaded
+                    archived_game = game_archive.get_game(game_id, refresh=True)
+                    if not archived_game:
+                        raise HTTPException(status_code=404, detail="Game not found")
+                    entry = game_cache.store_game(GameResponse(**archived_game))
+
+    headers = {"ETag": entry["game_etag"], "Cache-Control": "no-cache"}
+    if GameResponseCache.etag_matches(request.headers.get("if-none-match"), entry["game_etag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return entry["game"]
 
 @app.get("/")
 async def root():
@@ -418,17 +2135,23 @@ async def root():
         "status": "running",
         "endpoints": {
             "health": "/health",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
+            "metrics": "/metrics",
             "docs": "/docs",
             "redoc": "/redoc",
             "games": "/games/",
-            "websocket": "/ws/{game_id}?player_name={player_name}"
+            "tournaments": "/tournaments/",
+            "leaderboard": "/leaderboard?time_control=overall",
+            "websocket": "/ws/{game_id}?player_name={player_name}",
+            "tournament_websocket": "/ws/tournaments/{tournament_id}"
         },
         "timestamp": datetime.utcnow().isoformat()
     }
 
 # Enhanced health check with more details
 @app.get("/health")
-async def health_check(db: Session = Depends(get_db)):
+async def health_check(db: Session = Depends(get_probe_db)):
     try:
         # Test database connection
         db.execute(text("SELECT 1"))
@@ -444,6 +2167,60 @@ async def health_check(db: Session = Depends(get_db)):
         "version": "2.0.0"
     }
 
+# Liveness only says the process is serving requests; it never touches the database
+@app.get("/health/live")
+async def liveness_check():
+    return {
+        "status": "alive",
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+# Readiness says the database is reachable and this worker can take traffic
+@app.get("/health/ready")
+async def readiness_check():
+    def ping():
+        with get_engine(retry=True).connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    try:
+        await asyncio.to_thread(ping)
+    except Exception as e:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={
+                "status": "not_ready",
+                "database": f"error: {str(e)}",
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        )
+    # A worker serving from the local SQLite fallback must not receive production traffic
+    if db_state["fallback"]:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={
+                "status": "not_ready",
+                "database": f"sqlite fallback, configured database unreachable: {db_state['error']}",
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        )
+    return {
+        "status": "ready",
+        "database": db_state["dialect"],
+        "warmed_connections": db_state["warmed_connections"],
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+# Admission control counters, including rejected requests by reason
+@app.get("/metrics")
+async def metrics():
+    return {
+        "admission": admission.metrics(),
+        "active_games": len(manager.active_connections),
+        "live_games": len(game_states.games),
+        "cached_games": len(game_cache.entries),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
 # Debug endpoint to check current configuration
 @app.get("/debug/config")
 async def debug_config():
@@ -453,12 +2230,26 @@ async def debug_config():
             "***:***"
         ) if '@' in settings.database_url else settings.database_url,
         "cors_origins": settings.cors_origins,
+        "database_state": db_state,
+        "live_games": len(game_states.games),
+        "archived_games": game_archive.count(),
         "active_connections": {
             game_id: list(connections.keys()) 
             for game_id, connections in manager.active_connections.items()
         }
     }
 
+# Run the archival job now instead of waiting for the next interval
+@app.post("/debug/archive-finished-games")
+async def run_archive_job():
+    if not settings.archive_configured:
+        raise HTTPException(status_code=400, detail="Set ARCHIVE_DIR to shared storage to enable archival")
+    archived = await asyncio.to_thread(archive_finished_games)
+    return {
+        "archived": archived,
+        "archived_total": game_archive.count()
+    }
+
 # Test endpoint to create a sample game
 @app.post("/debug/create-test-game")
 async def create_test_game(db: Session = Depends(get_db)):
@@ -524,6 +2315,7 @@ async def join_game(game_id: str, join_data: JoinGameRequest, db: Session = Depe
             game.updated_at = datetime.utcnow()
             db.commit()
             db.refresh(game)
+            game_states.update(game, move_count=0)
             
             # Create proper response
             game_response = GameResponse(
@@ -542,6 +2334,7 @@ async def join_game(game_id: str, join_data: JoinGameRequest, db: Session = Depe
                 created_at=game.created_at,
                 updated_at=game.updated_at
             )
+            game_cache.store_game(game_response)
             
             # Broadcast game start to all connections
             await manager.broadcast_to_game({
@@ -561,8 +2354,31 @@ async def join_game(game_id: str, join_data: JoinGameRequest, db: Session = Depe
         raise HTTPException(status_code=500, detail=f"Failed to join game: {str(e)}")
 
 @app.get("/games/{game_id}/moves")
-async def get_game_moves(game_id: str, db: Session = Depends(get_db)):
-    moves = db.query(Move).filter(Move.game_id == game_id).order_by(Move.move_number).all()
+async def get_game_moves(game_id: str, request: Request, response: Response,
+                         since: Optional[int] = None):
+    moves = game_cache.get_moves(game_id)
+    if moves is None:
+        payload = game_archive.get_moves(game_id)
+        if payload is None:
+            with db_session() as db:
+                payload = [
+                    move_payload(move)
+                    for move in db.query(Move).filter(Move.game_id == game_id).order_by(Move.move_number)
+                ]
+        if not payload:
+            # Another worker may have archived it since our index was loaded
+            payload = game_archive.get_moves(game_id, refresh=True) or []
+        moves = game_cache.store_moves(game_id, payload)
+
+    # ?since=N returns only moves after move number N, for incremental polling
+    if since is not None:
+        moves = [move for move in moves if move["move_number"] > since]
+
+    etag = game_cache.moves_etag(game_id, moves, since)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if GameResponseCache.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
     return moves
 
 @app.get("/games/", response_model=List[GameResponse])
@@ -575,7 +2391,13 @@ async def get_games(skip: int = 0, limit: int = 10, status: Optional[str] = None
 
 # Move Validation and Processing
 @app.post("/games/{game_id}/moves", response_model=MoveResponse)
-async def make_move(game_id: str, move_request: MoveRequest, db: Session = Depends(get_db)):
+async def make_move(game_id: str, move_request: MoveRequest, request: Request, db: Session = Depends(get_db)):
+    if admission.check_move_ip(client_ip(request)):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many moves, slow down",
+            headers={"Retry-After": "1"}
+        )
     try:
         game = db.query(Game).filter(Game.id == game_id).first()
         if not game:
@@ -589,6 +2411,13 @@ async def make_move(game_id: str, move_request: MoveRequest, db: Session = Depen
            (game.current_turn == "black" and str(game.black_player_id) != move_request.player_id):
             raise HTTPException(status_code=400, detail="It's not your turn")
         
+        if admission.check_move_player(game_id, move_request.player_id):
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many moves, slow down",
+                headers={"Retry-After": "1"}
+            )
+        
         # Calculate time remaining
         current_time = datetime.utcnow()
         time_elapsed = (current_time - game.last_move_time).total_seconds()
@@ -604,7 +2433,10 @@ async def make_move(game_id: str, move_request: MoveRequest, db: Session = Depen
             game.status = "finished"
             game.result = "black_wins" if game.current_turn == "white" else "white_wins"
             game.termination = "timeout"
+            game.updated_at = current_time
             db.commit()
+            game_states.update(game)
+            cache_committed_game(game)
             
             await manager.broadcast_to_game({
                 "type": "game_ended",
@@ -616,6 +2448,8 @@ async def make_move(game_id: str, move_request: MoveRequest, db: Session = Depen
                     "black_time_left": game.black_time_left
                 }
             }, game_id)
+            leaderboard.on_game_finished(game, [])
+            await tournaments.on_game_finished(game)
             
             raise HTTPException(status_code=400, detail="Time expired")
         
@@ -624,9 +2458,11 @@ async def make_move(game_id: str, move_request: MoveRequest, db: Session = Depen
         if not is_valid:
             raise HTTPException(status_code=400, detail="Invalid move")
         
-        # Get move number
-        move_count = db.query(Move).filter(Move.game_id == game_id).count()
-        move_number = move_count + 1
+        # Get move number, skipping the count query when live state is current
+        move_number = game_states.next_move_number(game)
+        if move_number is None:
+            move_count = db.query(Move).filter(Move.game_id == game_id).count()
+            move_number = move_count + 1
         
         # Create move record
         db_move = Move(
@@ -672,6 +2508,7 @@ async def make_move(game_id: str, move_request: MoveRequest, db: Session = Depen
         
         db.commit()
         db.refresh(db_move)
+        game_states.update(game, move_count=move_number)
         
         # Create proper move response
         move_response = MoveResponse(
@@ -686,6 +2523,7 @@ async def make_move(game_id: str, move_request: MoveRequest, db: Session = Depen
             black_time_left=db_move.black_time_left,
             timestamp=db_move.timestamp
         )
+        cache_committed_game(game, db_move)
         
         # Broadcast move to all players in the game
         await manager.broadcast_to_game({
@@ -698,6 +2536,9 @@ async def make_move(game_id: str, move_request: MoveRequest, db: Session = Depen
                 "termination": game.termination
             }
         }, game_id)
+        if game.status == "finished":
+            leaderboard.on_game_finished(game, [white_player, black_player])
+            await tournaments.on_game_finished(game)
         
         return move_response
         
@@ -736,12 +2577,17 @@ async def resign_game(game_id: str, player_id: str, db: Session = Depends(get_db
             if game.result == "black_wins":
                 black_player.games_won += 1
         db.commit()
+        game_states.update(game)
+        game_response = GameResponse.from_orm(game)
+        game_cache.store_game(game_response)
         # Broadcast resignation
         await manager.broadcast_to_game({
             "type": "game_ended",
-            "game": jsonable_encoder(GameResponse.from_orm(game)),
+            "game": jsonable_encoder(game_response),
             "resigned_by": str(player_id)
         }, game_id)
+        leaderboard.on_game_finished(game, [white_player, black_player])
+        await tournaments.on_game_finished(game)
         return {"message": "Game resigned successfully"}
     except HTTPException:
         raise
@@ -750,48 +2596,192 @@ async def resign_game(game_id: str, player_id: str, db: Session = Depends(get_db
         logger.error(f"Error resigning game: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to resign game: {str(e)}")
 
+# Tournaments
+@app.post("/tournaments/")
+async def create_tournament(tournament_data: TournamentCreate):
+    tournament = ArenaTournament(
+        name=tournament_data.name,
+        time_control=tournament_data.time_control,
+        increment=tournament_data.increment,
+        duration_minutes=tournament_data.duration_minutes
+    )
+    tournaments.tournaments[tournament.id] = tournament
+    return tournament.summary()
+
+@app.get("/tournaments/")
+async def get_tournaments(status: Optional[str] = None):
+    return [
+        tournament.summary() for tournament in tournaments.tournaments.values()
+        if status is None or tournament.status == status
+    ]
+
+@app.get("/tournaments/{tournament_id}")
+async def get_tournament(tournament_id: str, skip: int = 0, limit: int = 50):
+    tournament = tournaments.get(tournament_id)
+    return {
+        **tournament.summary(),
+        "standings": tournament.standings()[skip:skip + limit]
+    }
+
+@app.post("/tournaments/{tournament_id}/start")
+async def start_tournament(tournament_id: str):
+    tournament = tournaments.get(tournament_id)
+    if tournament.status != "waiting":
+        raise HTTPException(status_code=400, detail="Tournament has already started")
+    tournament.status = "running"
+    tournament.starts_at = datetime.utcnow()
+    tournament.ends_at = tournament.starts_at + timedelta(minutes=tournament.duration_minutes)
+    await tournaments.broadcast(tournament, {
+        "type": "tournament_started",
+        "tournament": tournament.summary()
+    })
+    return tournament.summary()
+
+@app.post("/tournaments/{tournament_id}/join")
+async def join_tournament(tournament_id: str, join_data: JoinGameRequest, db: Session = Depends(get_db)):
+    tournament = tournaments.get(tournament_id)
+    if tournament.status == "finished":
+        raise HTTPException(status_code=400, detail="Tournament is finished")
+    try:
+        user = get_or_create_user(db, join_data.player_name, f"{join_data.player_name}@example.com")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error joining tournament: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to join tournament: {str(e)}")
+    standing = tournament.add_player(user)
+    await tournaments.broadcast(tournament, {
+        "type": "player_joined",
+        "player": standing
+    })
+    return {"message": "Joined tournament successfully", "player_id": str(user.id)}
+
+@app.post("/tournaments/{tournament_id}/leave")
+async def leave_tournament(tournament_id: str, player_id: str):
+    tournament = tournaments.get(tournament_id)
+    if player_id not in tournament.players:
+        raise HTTPException(status_code=403, detail="You are not a player in this tournament")
+    tournament.remove_player(player_id)
+    await tournaments.broadcast(tournament, {
+        "type": "player_left",
+        "player_id": player_id
+    })
+    return {"message": "Left tournament successfully"}
+
 # WebSocket Endpoint
+async def close_websocket(websocket: WebSocket, code: int, reason: str):
+    # Closing before accept reaches the client as a bare HTTP 403, so accept first to deliver the code
+    if websocket.client_state == WebSocketState.CONNECTING:
+        await websocket.accept()
+    await websocket.close(code=code, reason=reason)
+
 @app.websocket("/ws/{game_id}")
 async def websocket_endpoint(websocket: WebSocket, game_id: str, player_name: str):
+    # Shed before touching the database; 1013 is "try again later"
+    if admission.check_ws_connect(client_ip(websocket)):
+        await close_websocket(websocket, 1013, "Server is busy")
+        return
+    admission.websocket_connections += 1
     db = None
+    connection_key = None
     try:
+        await asyncio.to_thread(get_engine)
         db = SessionLocal()
         # Get or create user
         user = get_or_create_user(db, player_name, f"{player_name}@example.com")
         # Check if game exists
         game = db.query(Game).filter(Game.id == game_id).first()
         if not game:
-            await websocket.close(code=4004, reason="Game not found")
+            await close_websocket(websocket, 4004, "Game not found")
             return
-        await manager.connect(websocket, game_id, user.id)
+        user_id = user.id
+        await manager.connect(websocket, game_id, user_id)
+        connection_key = f"{game_id}:{user_id}"
+        game_response = GameResponse.from_orm(game)
+        # End the read transaction so an idle socket doesn't pin a pooled connection
+        db.commit()
         # Send initial game state
         await websocket.send_json({
             "type": "game_state",
-            "game": jsonable_encoder(GameResponse.from_orm(game)),
-            "player_id": str(user.id)
+            "game": jsonable_encoder(game_response),
+            "player_id": str(user_id)
         })
         try:
             while True:
                 data = await websocket.receive_json()
+                if admission.check_ws_message(connection_key):
+                    # 1008 is "policy violation"
+                    manager.disconnect(websocket, game_id, user_id)
+                    await close_websocket(websocket, 1008, "Rate limit exceeded")
+                    return
                 if data["type"] == "ping":
                     await websocket.send_json({"type": "pong"})
                 elif data["type"] == "request_game_state":
-                    db.refresh(game)
+                    live_state = game_states.get_restored(game_id)
+                    if not live_state:
+                        # Another worker may have moved since; only a version check touches the database
+                        updated_at = db.query(Game.updated_at).filter(Game.id == game_id).scalar()
+                        db.commit()
+                        live_state = game_states.get_current(game_id, updated_at)
+                    if live_state:
+                        game_response = game_states.to_response(live_state)
+                    else:
+                        db.refresh(game)
+                        game_response = GameResponse.from_orm(game)
+                        db.commit()
                     await websocket.send_json({
                         "type": "game_state",
-                        "game": jsonable_encoder(GameResponse.from_orm(game)),
-                        "player_id": str(user.id)
+                        "game": jsonable_encoder(game_response),
+                        "player_id": str(user_id)
                     })
         except WebSocketDisconnect:
-            manager.disconnect(websocket, game_id, user.id)
+            manager.disconnect(websocket, game_id, user_id)
         finally:
             if db:
                 db.close()
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
+        await close_websocket(websocket, 4000, "Internal server error")
+    finally:
         if db:
             db.close()
-        await websocket.close(code=4000, reason="Internal server error")
+        admission.websocket_connections -= 1
+        if connection_key:
+            admission.ws_message_limiter.forget(connection_key)
+
+@app.websocket("/ws/tournaments/{tournament_id}")
+async def tournament_websocket_endpoint(websocket: WebSocket, tournament_id: str):
+    if admission.check_ws_connect(client_ip(websocket)):
+        await close_websocket(websocket, 1013, "Server is busy")
+        return
+    tournament = tournaments.tournaments.get(tournament_id)
+    if not tournament:
+        await close_websocket(websocket, 4004, "Tournament not found")
+        return
+    admission.websocket_connections += 1
+    connection_id = uuid.uuid4().hex
+    try:
+        await tournaments.connections.connect(websocket, tournament_id, connection_id)
+        await websocket.send_json(jsonable_encoder({
+            "type": "tournament_state",
+            "tournament": tournament.summary(),
+            "standings": tournament.standings()
+        }))
+        while True:
+            data = await websocket.receive_json()
+            if admission.check_ws_message(connection_id):
+                await close_websocket(websocket, 1008, "Rate limit exceeded")
+                return
+            if data["type"] == "ping":
+                await websocket.send_json({"type": "pong"})
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Tournament WebSocket error: {e}")
+        await close_websocket(websocket, 4000, "Internal server error")
+    finally:
+        tournaments.connections.disconnect(websocket, tournament_id, connection_id)
+        admission.websocket_connections -= 1
+        admission.ws_message_limiter.forget(connection_id)
 
 if __name__ == "__main__":
     import uvicorn
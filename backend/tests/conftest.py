@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+# main.py reads its configuration at import time; keep tests off any real database
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("GAME_SNAPSHOT_PATH", os.path.join(tempfile.gettempdir(), "test_game_snapshots.json"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The models use PostgreSQL types, so the SQLite test schema is spelled out
+SCHEMA = [
+    """CREATE TABLE users (id VARCHAR PRIMARY KEY, username VARCHAR NOT NULL UNIQUE,
+       email VARCHAR NOT NULL UNIQUE, rating INTEGER, games_played INTEGER, games_won INTEGER,
+       is_active BOOLEAN, is_online BOOLEAN, last_seen DATETIME, created_at DATETIME)""",
+    """CREATE TABLE games (id VARCHAR PRIMARY KEY, white_player_id VARCHAR NOT NULL,
+       black_player_id VARCHAR, status VARCHAR, current_turn VARCHAR, fen VARCHAR, pgn TEXT,
+       result VARCHAR, termination VARCHAR, time_control INTEGER, increment INTEGER,
+       white_time_left INTEGER, black_time_left INTEGER, last_move_time DATETIME,
+       created_at DATETIME, updated_at DATETIME)""",
+    """CREATE TABLE moves (id INTEGER PRIMARY KEY, game_id VARCHAR NOT NULL,
+       player_id VARCHAR NOT NULL, move_notation VARCHAR NOT NULL, san_notation VARCHAR NOT NULL,
+       fen_before VARCHAR NOT NULL, fen_after VARCHAR NOT NULL, move_number INTEGER NOT NULL,
+       white_time_left INTEGER NOT NULL, black_time_left INTEGER NOT NULL, timestamp DATETIME)""",
+]
+
+
+def create_sqlite_engine(url: str = "sqlite://", **kwargs):
+    if url == "sqlite://":
+        kwargs.setdefault("poolclass", StaticPool)
+        kwargs.setdefault("connect_args", {"check_same_thread": False})
+    engine = create_engine(url, **kwargs)
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.exec_driver_sql(statement)
+    return engine
+
+
+@pytest.fixture
+def make_sqlite_engine():
+    return create_sqlite_engine
+
+
+@pytest.fixture
+def sqlite_engine():
+    engine = create_sqlite_engine()
+    yield engine
+    engine.dispose()
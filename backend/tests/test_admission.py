@@ -0,0 +1,85 @@
+import pytest
+
+import main
+from main import AdmissionController, TokenBucketLimiter, settings
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(main.time, "monotonic", fake)
+    return fake
+
+
+def test_bucket_allows_a_full_burst_then_rejects(clock):
+    limiter = TokenBucketLimiter(rate=1, burst=3)
+    assert [limiter.allow("a") for _ in range(4)] == [True, True, True, False]
+    # Other keys have their own bucket
+    assert limiter.allow("b")
+
+
+def test_bucket_refills_at_rate_up_to_burst(clock):
+    limiter = TokenBucketLimiter(rate=2, burst=3)
+    for _ in range(3):
+        limiter.allow("a")
+    clock.now += 0.5
+    assert limiter.allow("a")
+    assert not limiter.allow("a")
+    clock.now += 60
+    assert [limiter.allow("a") for _ in range(4)] == [True, True, True, False]
+
+
+def test_bucket_evicts_least_recently_seen_keys(clock):
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_keys=2)
+    limiter.allow("a")
+    limiter.allow("b")
+    limiter.allow("a")
+    limiter.allow("c")
+    assert list(limiter.buckets) == ["a", "c"]
+
+
+def test_player_buckets_are_per_game(clock, monkeypatch):
+    monkeypatch.setattr(settings, "move_burst_per_player", 1)
+    monkeypatch.setattr(settings, "rate_limit_enabled", True)
+    admission = AdmissionController(settings)
+    assert admission.check_move_player("game-1", "player") is None
+    assert admission.check_move_player("game-1", "player") == "move_player_rate"
+    assert admission.check_move_player("game-2", "player") is None
+    assert admission.rejections == {"move_player_rate": 1}
+
+
+def test_default_inflight_cap_matches_the_pool():
+    assert settings.max_inflight_requests == settings.db_pool_size + settings.db_max_overflow
+
+
+def test_inflight_cap_only_applies_to_database_sessions(monkeypatch, sqlite_engine):
+    from fastapi import HTTPException
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main, "engine", sqlite_engine)
+    main.SessionLocal.configure(bind=sqlite_engine)
+    monkeypatch.setattr(main.admission, "enabled", True)
+    monkeypatch.setattr(settings, "max_inflight_requests", 1)
+    held = main.get_db()
+    next(held)
+    with pytest.raises(HTTPException) as excinfo:
+        next(main.get_db())
+    assert excinfo.value.status_code == 429
+
+    # Routes that never check out a connection keep answering while the pool is full
+    client = TestClient(main.app)
+    assert client.get("/leaderboard").status_code == 200
+    assert client.get("/users/").status_code == 429
+
+    held.close()
+    assert main.admission.inflight_requests == 0
+    assert client.get("/users/").status_code == 200
+    main.SessionLocal.configure(bind=None)
@@ -0,0 +1,186 @@
+import json
+import multiprocessing
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from main import Game, GameArchive, Move, User, move_payload
+
+WHITE = "00000000-0000-0000-0000-00000000000a"
+BLACK = "00000000-0000-0000-0000-00000000000b"
+GAME_1 = "00000000-0000-0000-0000-000000000001"
+GAME_2 = "00000000-0000-0000-0000-000000000002"
+
+
+@pytest.fixture
+def db(sqlite_engine):
+    session = sessionmaker(bind=sqlite_engine)()
+    now = datetime.utcnow()
+    for user_id, name in ((WHITE, "white"), (BLACK, "black")):
+        session.add(User(id=user_id, username=name, email=f"{name}@example.com",
+                         rating=1200, games_played=0, games_won=0, last_seen=now, created_at=now))
+    session.commit()
+    yield session
+    session.close()
+
+
+def add_finished_game(db, game_id, ucis, finished_at):
+    import chess
+    board = chess.Board()
+    game = Game(id=game_id, white_player_id=WHITE, black_player_id=BLACK, status="finished",
+                current_turn="white", result="white_wins", termination="resignation",
+                time_control=180, increment=2, white_time_left=170, black_time_left=160,
+                last_move_time=finished_at, created_at=finished_at, updated_at=finished_at)
+    db.add(game)
+    for number, uci in enumerate(ucis, start=1):
+        fen_before = board.fen()
+        move = chess.Move.from_uci(uci)
+        san = board.san(move)
+        board.push(move)
+        db.add(Move(game_id=game_id, player_id=WHITE if number % 2 else BLACK, move_notation=uci,
+                    san_notation=san, fen_before=fen_before, fen_after=board.fen(), move_number=number,
+                    white_time_left=180 - number, black_time_left=180 - number, timestamp=finished_at))
+    db.commit()
+
+
+def hot_moves(db, game_id):
+    return [
+        move_payload(move)
+        for move in db.query(Move).filter(Move.game_id == game_id).order_by(Move.move_number)
+    ]
+
+
+def test_round_trip_matches_hot_rows_and_deletes_them(db, tmp_path):
+    finished_at = datetime(2026, 9, 1, 12, 0, 0)
+    add_finished_game(db, GAME_1, ["e2e4", "e7e5", "g1f3", "b8c6", "f1b5"], finished_at)
+    add_finished_game(db, GAME_2, ["d2d4"], finished_at + timedelta(minutes=1))
+    expected_moves = hot_moves(db, GAME_1)
+
+    archive = GameArchive(str(tmp_path))
+    assert archive.archive(db, datetime(2026, 10, 1), batch_size=10) == 2
+
+    assert db.query(Game).count() == 0
+    assert db.query(Move).count() == 0
+    assert archive.get_moves(GAME_1) == expected_moves
+    game = archive.get_game(GAME_1)
+    assert game["result"] == "white_wins"
+    assert game["updated_at"] == finished_at
+    assert len(archive.get_moves(GAME_2)) == 1
+
+    # A fresh reader (another worker, or after a restart) finds both from disk
+    reader = GameArchive(str(tmp_path))
+    assert reader.load_index() == 2
+    assert reader.get_moves(GAME_1) == expected_moves
+    assert sorted(reader.results()) == [
+        [WHITE, BLACK, 180, 2, "white_wins"],
+        [WHITE, BLACK, 180, 2, "white_wins"],
+    ]
+
+
+def _archive_worker(database_path, directory):
+    engine = create_engine(f"sqlite:///{database_path}", connect_args={"timeout": 30})
+    session = sessionmaker(bind=engine)()
+    archive = GameArchive(directory)
+    while archive.archive(session, datetime(2026, 10, 1), batch_size=3):
+        pass
+    session.close()
+
+
+def test_concurrent_workers_archive_each_game_once(tmp_path, make_sqlite_engine):
+    database_path = tmp_path / "games.db"
+    engine = make_sqlite_engine(f"sqlite:///{database_path}")
+    session = sessionmaker(bind=engine)()
+    game_ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(1, 25)]
+    for game_id in game_ids:
+        add_finished_game(session, game_id, ["e2e4", "e7e5"], datetime(2026, 9, 1))
+    session.close()
+
+    directory = str(tmp_path / "archive")
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_archive_worker, args=(database_path, directory)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+
+    reader = GameArchive(directory)
+    index_lines = (tmp_path / "archive" / "games-2026-09.idx").read_text().splitlines()
+    assert sorted(json.loads(line)[0] for line in index_lines) == game_ids
+    assert reader.load_index() == len(game_ids)
+    for game_id in game_ids:
+        assert [m["move_notation"] for m in reader.get_moves(game_id)] == ["e2e4", "e7e5"]
+
+
+def test_reads_legacy_three_field_index_lines(db, tmp_path):
+    add_finished_game(db, GAME_1, ["e2e4", "e7e5"], datetime(2026, 9, 1))
+    GameArchive(str(tmp_path)).archive(db, datetime(2026, 10, 1), batch_size=10)
+
+    index_path = tmp_path / "games-2026-09.idx"
+    game_id, offset, length, *_ = json.loads(index_path.read_text().splitlines()[0])
+    index_path.write_text(json.dumps([game_id, offset, length]) + "\n")
+
+    reader = GameArchive(str(tmp_path))
+    assert reader.load_index() == 1
+    assert [m["san_notation"] for m in reader.get_moves(GAME_1)] == ["e4", "e5"]
+    # Legacy entries have no summary, so they are left out of aggregates
+    assert list(reader.results()) == []
+
+
+def test_partial_index_line_is_picked_up_once_complete(db, tmp_path):
+    add_finished_game(db, GAME_1, ["e2e4"], datetime(2026, 9, 1))
+    GameArchive(str(tmp_path)).archive(db, datetime(2026, 10, 1), batch_size=10)
+    index_path = tmp_path / "games-2026-09.idx"
+    line = index_path.read_bytes()
+    index_path.write_bytes(line[:-10])
+
+    reader = GameArchive(str(tmp_path))
+    assert reader.load_index() == 0
+    index_path.write_bytes(line)
+    assert reader.load_index() == 1
+
+
+def test_ids_resolve_through_the_merged_lookup_file(db, tmp_path):
+    game_ids = [f"00000000-0000-0000-0000-{i:012d}" for i in range(1, 41)]
+    for game_id in game_ids[:30]:
+        add_finished_game(db, game_id, ["e2e4"], datetime(2026, 9, 1))
+    archive = GameArchive(str(tmp_path))
+    archive.archive(db, datetime(2026, 10, 1), batch_size=30)
+    assert archive.merge() == 1
+    for game_id in game_ids[30:]:
+        add_finished_game(db, game_id, ["d2d4"], datetime(2026, 9, 2))
+    archive.archive(db, datetime(2026, 10, 1), batch_size=30)
+
+    reader = GameArchive(str(tmp_path))
+    assert reader.load_index() == 40
+    state = reader.partitions["2026-09"]
+    # Only the lines appended after the merge are held in memory
+    assert (state["entries"], len(state["tail"])) == (30, 10)
+    for game_id in game_ids:
+        assert reader.get_game(game_id)["id"] == game_id
+    assert reader.get_game("00000000-0000-0000-0000-999999999999") is None
+    assert reader.get_game("not-a-uuid") is None
+
+    assert archive.merge() == 1
+    assert reader.load_index() == 0
+    state = reader.partitions["2026-09"]
+    assert (state["entries"], len(state["tail"])) == (40, 0)
+    assert [reader.get_moves(game_id)[0]["move_notation"] for game_id in game_ids] == ["e2e4"] * 30 + ["d2d4"] * 10
+    assert sum(1 for _ in reader.results()) == 40
+
+
+def test_archival_only_runs_with_an_explicit_archive_dir(monkeypatch, tmp_path):
+    import main
+    monkeypatch.delenv("ARCHIVE_DIR", raising=False)
+    monkeypatch.delenv("ARCHIVE_INTERVAL", raising=False)
+    assert main.Settings().archive_interval == 0
+    monkeypatch.setattr(main, "settings", main.Settings())
+    # Never reaches the database, so nothing can be deleted
+    monkeypatch.setattr(main, "get_engine", lambda: pytest.fail("archival touched the database"))
+    assert main.archive_finished_games() == 0
+
+    monkeypatch.setenv("ARCHIVE_DIR", str(tmp_path))
+    configured = main.Settings()
+    assert configured.archive_configured and configured.archive_interval == 3600
@@ -0,0 +1,13 @@
+from benchmark import percentile
+
+
+def test_nearest_rank_percentile():
+    values = list(range(1, 11))
+    assert percentile(values, 50) == 5
+    assert percentile(values, 99) == 10
+    assert percentile(values, 100) == 10
+    assert percentile(values, 0) == 1
+    # round(2.5) is 2, so the old rank picked the second value instead of the median
+    assert percentile([5, 1, 4, 2, 3], 50) == 3
+    assert percentile([7], 50) == 7
+    assert percentile([], 50) is None
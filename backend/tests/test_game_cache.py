@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import chess
+
+from main import GameResponse, GameResponseCache, Move, move_payload
+
+GAME_ID = "00000000-0000-0000-0000-000000000001"
+WHITE = "00000000-0000-0000-0000-00000000000a"
+
+
+def game_response(updated_at):
+    return GameResponse(
+        id=GAME_ID, white_player_id=WHITE, black_player_id=None, status="active",
+        current_turn="black", fen=chess.STARTING_FEN, time_control=180, increment=0,
+        white_time_left=180, black_time_left=180, created_at=updated_at, updated_at=updated_at
+    )
+
+
+def move_row(number, uci, fen_before, fen_after):
+    return Move(id=number, game_id=GAME_ID, player_id=WHITE, move_notation=uci, san_notation=uci,
+                fen_before=fen_before, fen_after=fen_after, move_number=number,
+                white_time_left=180, black_time_left=180, timestamp=datetime(2026, 9, 1))
+
+
+def test_appended_moves_have_the_same_shape_as_loaded_ones():
+    cache = GameResponseCache(ttl=60, max_entries=10)
+    first = move_row(1, "e2e4", "fen0", "fen1")
+    cache.store_moves(GAME_ID, [move_payload(first)])
+
+    cache.record_move(game_response(datetime(2026, 9, 1, 12)), move_row(2, "e7e5", "fen1", "fen2"))
+
+    moves = cache.get_moves(GAME_ID)
+    assert [m["move_number"] for m in moves] == [1, 2]
+    assert set(moves[0]) == set(moves[1])
+    assert moves[1]["fen_before"] == "fen1"
+
+
+def test_out_of_order_move_drops_the_cached_list():
+    cache = GameResponseCache(ttl=60, max_entries=10)
+    cache.store_moves(GAME_ID, [])
+    cache.record_move(game_response(datetime(2026, 9, 1, 12)), move_row(3, "e2e4", "a", "b"))
+    assert cache.get_moves(GAME_ID) is None
+
+
+def test_etag_changes_with_updated_at():
+    cache = GameResponseCache(ttl=60, max_entries=10)
+    first = cache.store_game(game_response(datetime(2026, 9, 1, 12)))["game_etag"]
+    assert GameResponseCache.etag_matches(first, first)
+    assert GameResponseCache.etag_matches(f"W/{first}", first)
+    second = cache.store_game(game_response(datetime(2026, 9, 1, 13)))["game_etag"]
+    assert second != first
+    assert not GameResponseCache.etag_matches(first, second)
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+import main
+from main import Game, User, app
+
+ALICE = "00000000-0000-0000-0000-0000000000a1"
+BOB = "00000000-0000-0000-0000-0000000000b2"
+GAME_ID = "00000000-0000-0000-0000-000000000001"
+START = datetime(2026, 9, 1, 12, 0, 0)
+
+
+class FrozenDatetime(datetime):
+    """Whole-second clock: SQLite keeps clocks as REAL, and GameResponse needs whole seconds"""
+    now = START
+
+    @classmethod
+    def utcnow(cls):
+        return cls.now
+
+
+def tick(seconds=1):
+    FrozenDatetime.now += timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def client(sqlite_engine, monkeypatch):
+    monkeypatch.setattr(main, "engine", sqlite_engine)
+    monkeypatch.setattr(main, "datetime", FrozenDatetime)
+    monkeypatch.setattr(main, "game_cache", main.GameResponseCache(ttl=60, max_entries=100))
+    monkeypatch.setattr(main, "game_states", main.GameStateStore(main.settings.snapshot_path))
+    monkeypatch.setattr(main.admission, "enabled", False)
+    main.SessionLocal.configure(bind=sqlite_engine)
+    FrozenDatetime.now = START
+    db = sessionmaker(bind=sqlite_engine)()
+    for user_id, name in ((ALICE, "alice"), (BOB, "bob")):
+        db.add(User(id=user_id, username=name, email=f"{name}@example.com", rating=1200,
+                    games_played=0, games_won=0, is_active=True, last_seen=START, created_at=START))
+    db.add(Game(id=GAME_ID, white_player_id=ALICE, status="waiting", current_turn="white",
+                fen="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", time_control=300,
+                increment=0, white_time_left=300, black_time_left=300, last_move_time=START,
+                created_at=START, updated_at=START))
+    db.commit()
+    db.close()
+    yield TestClient(app)
+    main.SessionLocal.configure(bind=None)
+
+
+def get_etag(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    return response.headers["ETag"]
+
+
+def test_if_none_match_gets_a_304_until_the_game_changes(client):
+    etag = get_etag(client, f"/games/{GAME_ID}")
+    response = client.get(f"/games/{GAME_ID}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    tick()
+    joined = client.post(f"/games/{GAME_ID}/join", json={"player_name": "bob"})
+    assert joined.status_code == 200
+    after_join = client.get(f"/games/{GAME_ID}", headers={"If-None-Match": etag})
+    assert after_join.status_code == 200
+    assert after_join.json()["status"] == "active"
+    assert after_join.headers["ETag"] != etag
+
+    tick()
+    moved = client.post(f"/games/{GAME_ID}/moves", json={"move": "e2e4", "player_id": ALICE})
+    assert moved.status_code == 200
+    after_move = get_etag(client, f"/games/{GAME_ID}")
+    assert after_move != after_join.headers["ETag"]
+
+    tick()
+    resigned = client.post(f"/games/{GAME_ID}/resign", params={"player_id": BOB})
+    assert resigned.status_code == 200
+    response = client.get(f"/games/{GAME_ID}", headers={"If-None-Match": after_move})
+    assert response.status_code == 200
+    assert response.json()["result"] == "white_wins"
+
+
+def test_moves_etag_follows_appends_and_since(client):
+    client.post(f"/games/{GAME_ID}/join", json={"player_name": "bob"})
+    empty = get_etag(client, f"/games/{GAME_ID}/moves")
+
+    for uci, player_id in (("e2e4", ALICE), ("e7e5", BOB)):
+        tick()
+        assert client.post(f"/games/{GAME_ID}/moves", json={"move": uci, "player_id": player_id}).status_code == 200
+
+    full = client.get(f"/games/{GAME_ID}/moves", headers={"If-None-Match": empty})
+    assert full.status_code == 200
+    assert [move["move_notation"] for move in full.json()] == ["e2e4", "e7e5"]
+    # Appended moves have the same shape as moves loaded from the database
+    assert "fen_before" in full.json()[1]
+
+    since = client.get(f"/games/{GAME_ID}/moves", params={"since": 1})
+    assert [move["move_number"] for move in since.json()] == [2]
+    assert since.headers["ETag"] != full.headers["ETag"]
+    assert client.get(f"/games/{GAME_ID}/moves", params={"since": 1},
+                      headers={"If-None-Match": since.headers["ETag"]}).status_code == 304
+    assert client.get(f"/games/{GAME_ID}/moves",
+                      headers={"If-None-Match": since.headers["ETag"]}).status_code == 200
+
+    tick()
+    client.post(f"/games/{GAME_ID}/moves", json={"move": "g1f3", "player_id": ALICE})
+    assert client.get(f"/games/{GAME_ID}/moves", params={"since": 1},
+                      headers={"If-None-Match": since.headers["ETag"]}).status_code == 200
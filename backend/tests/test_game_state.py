@@ -0,0 +1,90 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import chess
+
+from main import Game, GameStateStore
+
+GAME_ID = "00000000-0000-0000-0000-000000000001"
+
+
+def live_game(updated_at):
+    return Game(id=GAME_ID, white_player_id=None, black_player_id=None, status="active",
+                current_turn="white", fen=chess.STARTING_FEN, time_control=180, increment=0,
+                white_time_left=180, black_time_left=180, last_move_time=updated_at,
+                created_at=updated_at, updated_at=updated_at)
+
+
+def test_live_state_is_served_only_while_it_matches_the_database(tmp_path):
+    store = GameStateStore(str(tmp_path / "snapshot.json"))
+    seen = datetime(2026, 9, 1, 12)
+    store.update(live_game(seen))
+
+    assert store.get_current(GAME_ID, seen)["fen"] == chess.STARTING_FEN
+    # A move committed by another worker bumps updated_at
+    assert store.get_current(GAME_ID, datetime(2026, 9, 1, 12, 0, 5)) is None
+    assert store.get_current(GAME_ID, None) is None
+    assert store.get_restored(GAME_ID) is None
+
+
+def test_restarted_worker_takes_over_its_predecessors_slot(tmp_path):
+    base = str(tmp_path / "game_snapshots.json")
+    first, second = GameStateStore(base), GameStateStore(base)
+    assert first.claim_slot() == str(tmp_path / "game_snapshots.0.json")
+    assert second.claim_slot() == str(tmp_path / "game_snapshots.1.json")
+    seen = datetime.utcnow()
+    first.update(live_game(seen), move_count=4)
+    first.save()
+
+    # The first worker exits, its replacement gets slot 0 and its games back
+    first._slot_file.close()
+    restarted = GameStateStore(base)
+    assert restarted.claim_slot() == first.path
+    assert restarted.load() == 1
+    assert restarted.get_restored(GAME_ID)["move_count"] == 4
+    assert GameStateStore(base).claim_slot("web-3") == str(tmp_path / "game_snapshots.web-3.json")
+
+
+def test_restored_state_is_served_until_reconcile(tmp_path, sqlite_engine):
+    from sqlalchemy.orm import sessionmaker
+    path = str(tmp_path / "snapshot.json")
+    store = GameStateStore(path)
+    store.update(live_game(datetime.utcnow()))
+    store.save()
+
+    restored = GameStateStore(path)
+    restored.load()
+    assert restored.get_restored(GAME_ID) is not None
+    restored.reconcile(sessionmaker(bind=sqlite_engine)())
+    # The database has no such game, so it is gone and nothing is served unchecked
+    assert restored.get_restored(GAME_ID) is None
+    assert restored.get(GAME_ID) is None
+
+
+def test_old_snapshots_are_ignored_and_removed(tmp_path):
+    base = str(tmp_path / "game_snapshots.json")
+    store = GameStateStore(base)
+    store.claim_slot()
+    store.update(live_game(datetime.utcnow()))
+    store.save()
+    payload = json.loads(open(store.path).read())
+    payload["written_at"] = (datetime.utcnow() - timedelta(hours=2)).isoformat()
+    with open(store.path, "w") as f:
+        json.dump(payload, f)
+    assert GameStateStore(store.path).load() == 0
+
+    # Files of slots nobody holds, including the old pid-named ones, go once they are old
+    orphan = tmp_path / "game_snapshots.48213.json"
+    fresh = tmp_path / "game_snapshots.7.json"
+    orphan.write_text("{}")
+    fresh.write_text("{}")
+    stale = time.time() - 3600
+    os.utime(orphan, (stale, stale))
+    os.utime(store.path, (stale, stale))
+    assert GameStateStore(base).remove_stale() == 1
+    assert not orphan.exists()
+    assert fresh.exists()
+    # A held slot is never removed, however old
+    assert os.path.exists(store.path)
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from main import Settings, readiness_check
+
+
+def test_readiness_fails_while_on_the_sqlite_fallback(monkeypatch):
+    monkeypatch.setitem(main.db_state, "fallback", True)
+    monkeypatch.setitem(main.db_state, "error", "connection refused")
+    response = asyncio.run(readiness_check())
+    assert response.status_code == 503
+
+
+def test_readiness_passes_on_the_configured_database(monkeypatch):
+    monkeypatch.setitem(main.db_state, "fallback", False)
+    assert asyncio.run(readiness_check())["status"] == "ready"
+
+
+def test_sqlite_fallback_is_off_for_an_explicit_database_url(monkeypatch):
+    monkeypatch.delenv("ALLOW_SQLITE_FALLBACK", raising=False)
+    monkeypatch.setenv("DATABASE_URL", "postgresql://db.internal/chess")
+    assert not Settings().allow_sqlite_fallback
+    monkeypatch.delenv("DATABASE_URL")
+    assert Settings().allow_sqlite_fallback
+    monkeypatch.setenv("DATABASE_URL", "postgresql://db.internal/chess")
+    monkeypatch.setenv("ALLOW_SQLITE_FALLBACK", "true")
+    assert Settings().allow_sqlite_fallback
+
+
+class UnreachableEngine:
+    attempts = 0
+
+    def connect(self):
+        UnreachableEngine.attempts += 1
+        raise OSError("connection refused")
+
+    def dispose(self):
+        pass
+
+
+def test_failed_connect_fails_fast_until_the_backoff_passes(monkeypatch):
+    UnreachableEngine.attempts = 0
+    monkeypatch.setattr(main, "engine", None)
+    monkeypatch.setattr(main, "_build_engine", lambda url: UnreachableEngine())
+    monkeypatch.setattr(main.settings, "allow_sqlite_fallback", False)
+    monkeypatch.setitem(main.db_state, "failed_at", None)
+
+    with pytest.raises(OSError):
+        main.get_engine()
+    for _ in range(3):
+        with pytest.raises(main.DatabaseUnavailable):
+            main.get_engine()
+    with pytest.raises(HTTPException) as excinfo:
+        next(main.get_db())
+    assert excinfo.value.status_code == 503
+    assert UnreachableEngine.attempts == 1
+
+    # Warm-up and readiness still retry inside the window
+    with pytest.raises(OSError):
+        main.get_engine(retry=True)
+    assert UnreachableEngine.attempts == 2
+
+    monkeypatch.setitem(main.db_state, "failed_at", main.db_state["failed_at"] - main.settings.db_retry_backoff)
+    with pytest.raises(OSError):
+        main.get_engine()
+    assert UnreachableEngine.attempts == 3
@@ -0,0 +1,137 @@
+import bisect
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+import main
+from main import Game, GameArchive, IndexableSkipList, Leaderboard, User
+
+PLAYERS = [f"00000000-0000-0000-0000-0000000000a{i}" for i in range(3)]
+
+
+def test_skip_list_matches_a_sorted_list():
+    rng = random.Random(7)
+    skip_list = IndexableSkipList()
+    reference = []
+    for _ in range(3000):
+        if reference and rng.random() < 0.4:
+            key = rng.choice(reference)
+            skip_list.remove(key)
+            reference.remove(key)
+        else:
+            key = (rng.randint(-50, 50), rng.random())
+            skip_list.insert(key, key[1])
+            bisect.insort(reference, key)
+        assert len(skip_list) == len(reference)
+        probe = rng.choice(reference) if reference else (0, 0.0)
+        assert skip_list.rank(probe) == (reference.index(probe) if probe in reference else None)
+        start, count = rng.randint(0, len(reference) + 2), rng.randint(0, 12)
+        assert skip_list.slice(start, count) == [(key, key[1]) for key in reference[start:start + count]]
+    assert [key for key, _ in skip_list.slice(0, len(reference))] == reference
+
+
+def test_skip_list_rejects_missing_keys():
+    skip_list = IndexableSkipList()
+    skip_list.insert((1,), "a")
+    with pytest.raises(KeyError):
+        skip_list.remove((2,))
+    assert skip_list.rank((2,)) is None
+    assert skip_list.slice(1, 5) == []
+
+
+@pytest.fixture
+def db(sqlite_engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "game_archive", GameArchive(str(tmp_path / "archive")))
+    session = sessionmaker(bind=sqlite_engine)()
+    now = datetime.utcnow()
+    for index, user_id in enumerate(PLAYERS):
+        session.add(User(id=user_id, username=f"player{index}", email=f"player{index}@example.com",
+                         rating=1500, games_played=0, games_won=0, is_active=True,
+                         last_seen=now, created_at=now))
+    session.commit()
+    yield session
+    session.close()
+
+
+def finished_game(game_id, white_id, black_id, finished_at):
+    return Game(id=game_id, white_player_id=white_id, black_player_id=black_id, status="finished",
+                result="white_wins", termination="resignation", time_control=300, increment=0,
+                white_time_left=100, black_time_left=100, last_move_time=finished_at,
+                created_at=finished_at, updated_at=finished_at)
+
+
+def test_rebuild_keeps_games_finished_while_it_runs(db, sqlite_engine):
+    db.add(finished_game("00000000-0000-0000-0000-000000000001", PLAYERS[0], PLAYERS[1],
+                         datetime.utcnow() - timedelta(hours=1)))
+    db.commit()
+    leaderboard = Leaderboard()
+    late_games = []
+
+    # Another request finishes a game between the rebuild's queries and its swap. Its
+    # updated_at was set before its commit, so it predates the rebuild's start.
+    def finish_during_rebuild(conn, cursor, statement, *args):
+        if "FROM games" in statement and not late_games:
+            late_games.append(finished_game("00000000-0000-0000-0000-000000000002", PLAYERS[2], PLAYERS[1],
+                                            datetime.utcnow() - timedelta(minutes=1)))
+            leaderboard.on_game_finished(late_games[0], [])
+
+    event.listen(sqlite_engine, "before_cursor_execute", finish_during_rebuild)
+    try:
+        leaderboard.rebuild(db)
+    finally:
+        event.remove(sqlite_engine, "before_cursor_execute", finish_during_rebuild)
+
+    blitz = {entry["user_id"]: entry for entry in leaderboard.top("blitz", 0, 10)}
+    assert blitz[PLAYERS[0]]["wins"] == 1
+    assert blitz[PLAYERS[2]]["wins"] == 1
+    assert blitz[PLAYERS[1]]["losses"] == 2
+
+    # Replayed updates don't double count once the game is visible to the next rebuild
+    db.add(late_games[0])
+    db.commit()
+    leaderboard.rebuild(db)
+    assert leaderboard.rank("blitz", PLAYERS[1])["losses"] == 2
+
+
+def test_rebuild_skips_replaying_games_it_already_counted(db, sqlite_engine):
+    game = finished_game("00000000-0000-0000-0000-000000000001", PLAYERS[0], PLAYERS[1], datetime.utcnow())
+    db.add(game)
+    db.commit()
+    leaderboard = Leaderboard()
+    notified = []
+
+    # The game is committed before the queries but its update lands while they run
+    def notify_during_rebuild(conn, cursor, statement, *args):
+        if "FROM games" in statement and not notified:
+            notified.append(True)
+            leaderboard.on_game_finished(game, [])
+
+    event.listen(sqlite_engine, "before_cursor_execute", notify_during_rebuild)
+    try:
+        leaderboard.rebuild(db)
+    finally:
+        event.remove(sqlite_engine, "before_cursor_execute", notify_during_rebuild)
+
+    assert leaderboard.rank("blitz", PLAYERS[0])["wins"] == 1
+    assert leaderboard.rank("blitz", PLAYERS[1])["losses"] == 1
+
+
+def test_rebuild_builds_the_new_boards_outside_the_lock(db, monkeypatch):
+    db.add(finished_game("00000000-0000-0000-0000-000000000001", PLAYERS[0], PLAYERS[1], datetime.utcnow()))
+    db.commit()
+    leaderboard = Leaderboard()
+    rekey = Leaderboard._rekey
+    locked = []
+
+    def tracking_rekey(self, board, user_id):
+        if self is not leaderboard:
+            locked.append(leaderboard._lock.locked())
+        rekey(self, board, user_id)
+
+    monkeypatch.setattr(Leaderboard, "_rekey", tracking_rekey)
+    leaderboard.rebuild(db)
+    assert locked and not any(locked)
+    assert [entry["user_id"] for entry in leaderboard.top("blitz", 0, 10)] == PLAYERS[:2]
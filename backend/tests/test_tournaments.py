@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+import main
+from main import ArenaTournament, Game, TournamentManager, User
+
+PLAYERS = [f"00000000-0000-0000-0000-0000000000a{i}" for i in range(4)]
+GAME_1 = "00000000-0000-0000-0000-000000000001"
+GAME_2 = "00000000-0000-0000-0000-000000000002"
+
+
+@pytest.fixture
+def db(sqlite_engine, monkeypatch):
+    monkeypatch.setattr(main, "engine", sqlite_engine)
+    main.SessionLocal.configure(bind=sqlite_engine)
+    session = sessionmaker(bind=sqlite_engine)()
+    now = datetime.utcnow()
+    for index, user_id in enumerate(PLAYERS):
+        session.add(User(id=user_id, username=f"player{index}", email=f"player{index}@example.com",
+                         rating=1500, games_played=0, games_won=0, last_seen=now, created_at=now))
+    session.commit()
+    yield session
+    session.close()
+    main.SessionLocal.configure(bind=None)
+
+
+def add_game(db, game_id, white_id, black_id, last_move_time, black_time_left=60):
+    db.add(Game(id=game_id, white_player_id=white_id, black_player_id=black_id, status="active",
+                current_turn="black", time_control=60, increment=0, white_time_left=60,
+                black_time_left=black_time_left, last_move_time=last_move_time,
+                created_at=last_move_time, updated_at=last_move_time))
+    db.commit()
+
+
+@pytest.fixture
+def manager(db):
+    manager = TournamentManager()
+    tournament = ArenaTournament("Arena", time_control=60, increment=0, duration_minutes=30)
+    tournament.status = "running"
+    tournament.ends_at = datetime.utcnow() + timedelta(minutes=30)
+    for user in db.query(User).all():
+        tournament.add_player(user)
+    manager.tournaments[tournament.id] = tournament
+    for game_id, white_id, black_id in ((GAME_1, PLAYERS[0], PLAYERS[1]), (GAME_2, PLAYERS[2], PLAYERS[3])):
+        tournament.waiting -= {white_id, black_id}
+        tournament.start_game(game_id, white_id, black_id)
+        manager.game_tournaments[game_id] = tournament.id
+    return manager
+
+
+def test_wave_flags_abandoned_games_and_frees_their_players(db, manager):
+    now = datetime.utcnow()
+    add_game(db, GAME_1, PLAYERS[0], PLAYERS[1], now - timedelta(seconds=90))
+    add_game(db, GAME_2, PLAYERS[2], PLAYERS[3], now - timedelta(seconds=10))
+
+    assert asyncio.run(manager.finish_expired_games()) == 1
+
+    db.expire_all()
+    flagged = db.get(Game, GAME_1)
+    assert (flagged.status, flagged.result, flagged.termination) == ("finished", "white_wins", "timeout")
+    assert db.get(Game, GAME_2).status == "active"
+    tournament = next(iter(manager.tournaments.values()))
+    assert tournament.players[PLAYERS[0]]["score"] == 2
+    assert {PLAYERS[0], PLAYERS[1]} <= tournament.waiting
+    assert list(manager.game_tournaments) == [GAME_2]
+
+
+def test_wave_picks_up_games_finished_by_another_worker(db, manager):
+    now = datetime.utcnow()
+    add_game(db, GAME_1, PLAYERS[0], PLAYERS[1], now)
+    add_game(db, GAME_2, PLAYERS[2], PLAYERS[3], now)
+    db.get(Game, GAME_2).status = "finished"
+    db.get(Game, GAME_2).result = "draw"
+    db.commit()
+
+    assert asyncio.run(manager.finish_expired_games()) == 1
+    tournament = next(iter(manager.tournaments.values()))
+    assert tournament.players[PLAYERS[2]]["draws"] == 1
+    assert list(manager.game_tournaments) == [GAME_1]
+
+
+def test_wave_creates_paired_games_in_one_insert(db):
+    from sqlalchemy import event
+
+    manager = TournamentManager()
+    tournament = ArenaTournament("Arena", time_control=60, increment=0, duration_minutes=30)
+    tournament.status = "running"
+    tournament.ends_at = datetime.utcnow() + timedelta(minutes=30)
+    for user in db.query(User).all():
+        tournament.add_player(user)
+    manager.tournaments[tournament.id] = tournament
+
+    inserts = []
+    engine = db.get_bind()
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO GAMES"):
+            inserts.append(statement)
+    event.listen(engine, "before_cursor_execute", count_inserts)
+    try:
+        assert asyncio.run(manager.run_pairing_wave()) == 2
+    finally:
+        event.remove(engine, "before_cursor_execute", count_inserts)
+
+    assert len(inserts) == 1
+    assert not tournament.waiting
+    games = {game.id: game for game in db.query(Game).all()}
+    assert set(tournament.games) == set(games) == set(manager.game_tournaments)
+    for game_id, (white_id, black_id) in tournament.games.items():
+        game = games[game_id]
+        assert (game.white_player_id, game.black_player_id, game.status) == (white_id, black_id, "active")
+        assert tournament.players[white_id]["current_game"] == game_id
+        assert tournament.players[black_id]["current_game"] == game_id